@@ -1,49 +1,191 @@
 '''pseudo is translating asts'''
-import pseudo.api_translators
-import pseudo.api_translators.ruby_translator
-import pseudo.api_translators.python_translator
-import pseudo.api_translators.js_translator
-import pseudo.api_translators.csharp_translator
-import pseudo.api_translators.cpp_translator
-import pseudo.api_translators.golang_translator
-import pseudo.api_translators.php_translator
-
-import pseudo.generators
-import pseudo.generators.ruby_generator
-import pseudo.generators.python_generator
-import pseudo.generators.js_generator
-import pseudo.generators.csharp_generator
-import pseudo.generators.cpp_generator
-import pseudo.generators.golang_generator
-import pseudo.generators.php_generator
+import collections.abc
+import importlib
+import os
+import weakref
+import pseudo.loader
+import pseudo.cache
+from pseudo.pseudo_tree import Node
+from pseudo.tree_transformer import iterative_walks
 
 SUPPORTED_FORMATS = {'js', 'javascript', 'py', 'python', 'rb', 'ruby', 'php', 'go', 'golang', 'cs', 'csharp', 'cpp'}
 FILE_EXTENSIONS = {'js': 'js', 'javascript': 'js', 'py': 'py', 'python': 'py', 'rb': 'rb', 'ruby': 'rb', 'php': 'php', 'go': 'go', 'golang': 'go', 'cs': 'cs', 'csharp': 'cs', 'cpp': 'cpp'}
 FULL_NAMES = {'js': 'javascript', 'javascript': 'javascript', 'py': 'python', 'python': 'python', 'rb': 'ruby', 'ruby': 'ruby', 'csharp': 'c#', 'cs': 'c#', 'go': 'golang', 'golang': 'golang', 'cpp': 'c++', 'php': 'php'}
 NAMES = {'js': 'JS', 'javascript': 'JS', 'py': 'Python', 'python': 'Python', 'rb': 'Ruby', 'ruby': 'Ruby', 'c#': 'CSharp', 'cs': 'CSharp', 'csharp': 'CSharp', 'golang': 'Golang', 'go': 'Golang', 'cpp': 'Cpp', 'php': 'PHP'}
 
-API_TRANSLATORS = {
-    format: getattr(
-                getattr(
-                    pseudo.api_translators,
-                    '%s_translator' % NAMES[format].lower()),
-                '%sTranslator' % NAMES[format])
-    for format in SUPPORTED_FORMATS
-}
-
-GENERATORS = {
-    format: getattr(
-                getattr(
-                    pseudo.generators,
-                    '%s_generator' % NAMES[format].lower()),
-                '%sGenerator' % NAMES[format])
-    for format in SUPPORTED_FORMATS
-}
-
-
-def generate(pseudo_ast, language):
-    '''generate output code in the given language'''
-    translated_ast = API_TRANSLATORS[language](pseudo_ast).api_translate()
-    # print(language, API_TRANSLATORS[language].functions['io']['display'])
-    # input()
-    return GENERATORS[language]().generate(translated_ast)
+
+class LazyRegistry(collections.abc.MutableMapping):
+    '''
+    format => translator or generator class, like a dict
+
+    the module of a class is imported on its first lookup,
+    so a run for one language imports only its translator and generator
+    '''
+
+    def __init__(self, package, kind):
+        self.package = package # api_translators / generators
+        self.kind = kind # Translator / Generator
+        self.formats = set(SUPPORTED_FORMATS)
+        self.classes = {}
+
+    def __getitem__(self, format):
+        if format not in self.classes:
+            if format not in self.formats:
+                raise KeyError(format)
+            module = importlib.import_module('pseudo.%s.%s_%s' % (self.package, NAMES[format].lower(), self.kind.lower()))
+            self.classes[format] = getattr(module, NAMES[format] + self.kind)
+        return self.classes[format]
+
+    def __setitem__(self, format, cls):
+        self.formats.add(format)
+        self.classes[format] = cls
+
+    def __delitem__(self, format):
+        self.formats.remove(format)
+        self.classes.pop(format, None)
+
+    def __iter__(self):
+        return iter(list(self.formats))
+
+    def __len__(self):
+        return len(self.formats)
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__, ', '.join(sorted(self.formats)))
+
+
+API_TRANSLATORS = LazyRegistry('api_translators', 'Translator')
+
+GENERATORS = LazyRegistry('generators', 'Generator')
+
+
+def warm_up(languages=None):
+    '''
+    parse the templates of the generators for languages(all by default)
+
+    the parsed(and compiled, for generators using compiled templates) templates
+    are cached per generator class, so after that no generator instance parses templates again
+    '''
+    languages = SUPPORTED_FORMATS if languages is None else languages
+    for generator in {GENERATORS[language] for language in languages}:
+        generator.parsed_templates()
+        if generator.compiled:
+            generator.compiled_templates()
+
+
+if os.environ.get('PSEUDO_WARM_UP'):
+    warm_up()
+
+
+def generate(pseudo_ast, language, trace=None, cache=None, profile=None, names=None, iterative=False):
+    '''
+    generate output code in the given language
+
+    pseudo_ast isn't changed, so it can be cached and reused
+
+    trace: an optional trace(event, stage, node, detail) callback,
+           see CodeGenerator and TreeTransformer.set_trace
+    cache: an optional pseudo.cache.TranslationCache, on a hit the tree isn't translated at all
+           (not used with trace, profile or names)
+    profile: an optional pseudo.profile.Profile, it gets the time, the nodes
+             and the allocations of each stage
+    names: an optional dict, it gets generated name => source name
+           for each name changed for the language conventions
+    iterative: walk the tree with explicit stacks instead of recursive calls in each stage,
+               so deep trees(long chains of operations or elifs) don't hit the recursion limit
+    '''
+    if cache and not trace and not profile and names is None:
+        return _cached_generate(pseudo_ast, language, cache, iterative=iterative)
+    return _generate(pseudo_ast, language, trace, profile, names, iterative)
+
+
+def generate_many(pseudo_ast, languages, trace=None, cache=None, profile=None, names=None, iterative=False):
+    '''
+    generate output code in each of the languages
+
+    pseudo_ast can be a tree or intermediate code, it's parsed once
+    and it's shared by all the languages: translators and middlewares
+    copy only the nodes they change, so pseudo_ast isn't changed
+
+    returns a dict language => output code,
+    names(optional) gets language => the names dict of generate
+    iterative: see generate
+    '''
+    if not isinstance(pseudo_ast, Node):
+        if profile:
+            profile.language = None
+            pseudo_ast = profile.run('parse', pseudo.loader.as_tree, pseudo_ast)
+        else:
+            pseudo_ast = pseudo.loader.as_tree(pseudo_ast)
+    if cache and not trace and not profile and names is None:
+        tree_digest = pseudo.cache.tree_hash(pseudo_ast)
+        return {language: _cached_generate(pseudo_ast, language, cache, tree_digest, iterative) for language in languages}
+    return {
+        language: _generate(pseudo_ast, language, trace, profile,
+                            None if names is None else names.setdefault(language, {}), iterative)
+        for language in languages
+    }
+
+
+# agenerate runs the translations in this executor(None: the default executor of the loop),
+# at most max_translations at once in each event loop, see configure_async
+_async_executor = None
+_max_translations = os.cpu_count() or 1
+_semaphores = weakref.WeakKeyDictionary() # event loop => semaphore
+
+
+def configure_async(executor=None, max_translations=None):
+    '''
+    set the executor of agenerate / agenerate_many and the limit of in-flight translations
+
+    a ThreadPoolExecutor keeps the event loop responsive, a ProcessPoolExecutor
+    translates in parallel too(the arguments are pickled, so no trace or cache)
+    '''
+    global _async_executor, _max_translations
+    _async_executor = executor
+    if max_translations is not None:
+        _max_translations = max_translations
+        _semaphores.clear()
+
+
+async def agenerate(pseudo_ast, language, trace=None, cache=None):
+    '''generate as a coroutine: it runs in the executor of configure_async, the event loop isn't blocked'''
+    return await _in_executor(generate, pseudo_ast, language, trace, cache)
+
+
+async def agenerate_many(pseudo_ast, languages, trace=None, cache=None):
+    '''generate_many as a coroutine, see agenerate'''
+    return await _in_executor(generate_many, pseudo_ast, languages, trace, cache)
+
+
+async def _in_executor(function, *args):
+    import asyncio # only for the async api
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(_max_translations)
+    async with semaphore:
+        return await loop.run_in_executor(_async_executor, function, *args)
+
+
+def _cached_generate(pseudo_ast, language, cache, tree_digest=None, iterative=False):
+    key = cache.key(pseudo_ast, language, tree_digest)
+    code = cache.get(key)
+    if code is None:
+        code = _generate(pseudo_ast, language, None, iterative=iterative)
+        cache.set(key, code)
+    return code
+
+
+def _generate(pseudo_ast, language, trace, profile=None, names=None, iterative=False):
+    # with iterative the transformers of the run(the translator, the middlewares) walk iteratively
+    with iterative_walks(iterative):
+        translator = API_TRANSLATORS[language](pseudo_ast)
+        if trace:
+            translator.set_trace(trace, 'api_translate')
+        if profile:
+            profile.language = language
+            translated_ast = profile.run('api_translate', lambda tree: translator.api_translate(), translator.tree)
+        else:
+            translated_ast = translator.api_translate()
+        return GENERATORS[language](trace=trace, profile=profile, names=names, iterative=iterative).generate(translated_ast)
@@ -1,10 +1,9 @@
 from pseudo.tree_transformer import TreeTransformer
 from pseudo.types import *
 from pseudo.env import Env
-from pseudo.pseudo_tree import Node, to_node, method_call, call, local
+from pseudo.pseudo_tree import Node, to_node, method_call, call, local, copy_node
 from pseudo.errors import PseudoStandardLibraryError, PseudoDSLError
 from pseudo.api_handlers import LeakingNode, NormalLeakingNode, BizarreLeakingNode
-import copy
 
 TYPES = {'List', 'Dictionary', 'Set', 'Tuple', 'Regexp', 'Array', 'String'}
 
@@ -24,6 +23,123 @@ def to_op(op, reversed=False):
     return transformer
 
 
+def compile_api(api, translator=None, is_function=False):
+    '''
+    compile an api dsl entry to an expand(translator, receiver, args, pseudo_type, equivalent) function
+
+    with translator(a class), unknown %{<name>} placeholders are errors too
+    raises PseudoDSLError for invalid entries
+    '''
+
+    if callable(api):
+        def expand(translator, receiver, args, pseudo_type, equivalent):
+            if receiver:
+                return api(receiver, *(args + [pseudo_type]))
+            else:
+                return api(*(args + [pseudo_type]))
+        return expand
+    elif not isinstance(api, str) or not api:
+        raise PseudoDSLError('%s not supported by api dsl' % str(api))
+
+    if '(' in api:
+        if api.count('(') != 1 or api[-1] != ')':
+            raise PseudoDSLError('%s not supported by api dsl' % api)
+        call_api, arg_code = api[:-1].split('(')
+        arg_parts = [compile_part(a.strip(), api, translator, is_function) for a in arg_code.split(',')]
+    else:
+        call_api, arg_parts = api, None
+
+    def expand_args(translator, receiver, args, equivalent):
+        if arg_parts is None:
+            return args
+        return [part(translator, receiver, args, equivalent) for part in arg_parts]
+
+    if '#' in call_api or '.' in call_api:
+        a, separator, b = call_api.partition('#' if '#' in call_api else '.')
+        if not b or '#' in b or '.' in b:
+            raise PseudoDSLError('%s not supported by api dsl' % api)
+        receiver_part = compile_part(a, api, translator, is_function) if a else None
+
+        if separator == '#':
+            def expand(translator, receiver, args, pseudo_type, equivalent):
+                args = expand_args(translator, receiver, args, equivalent)
+                method_receiver = receiver_part(translator, receiver, args, equivalent) if receiver_part else receiver
+                return method_call(method_receiver, b, args, pseudo_type=pseudo_type)
+        elif b[-1] != '!':
+            def expand(translator, receiver, args, pseudo_type, equivalent):
+                args = expand_args(translator, receiver, args, equivalent)
+                static_receiver = receiver_part(translator, receiver, args, equivalent) if receiver_part else receiver
+                return Node('static_call', receiver=static_receiver, message=b, args=args, pseudo_type=pseudo_type)
+        else:
+            def expand(translator, receiver, args, pseudo_type, equivalent):
+                args = expand_args(translator, receiver, args, equivalent)
+                static_receiver = receiver_part(translator, receiver, args, equivalent) if receiver_part else receiver
+                return Node('attr', object=static_receiver, attr=b[:-1], pseudo_type=pseudo_type)
+    else:
+        def expand(translator, receiver, args, pseudo_type, equivalent):
+            args = expand_args(translator, receiver, args, equivalent)
+            if receiver:
+                return call(call_api, [receiver] + args, pseudo_type=pseudo_type)
+            else:
+                return call(call_api, args, pseudo_type=pseudo_type)
+    return expand
+
+
+def compile_part(part, api, translator=None, is_function=False):
+    '''compile a receiver/arg of an api dsl entry to a part(translator, receiver, args, equivalent) function'''
+
+    if not part:
+        raise PseudoDSLError('%s not supported by api dsl' % api)
+    elif part[0] != '%':
+        return lambda translator, receiver, args, equivalent: local(part)
+    elif part[1:2] != '{' or part[-1] != '}':
+        raise PseudoDSLError('%s not supported by api dsl' % api)
+
+    inside = part[2:-1]
+    if inside.isnumeric():
+        index = int(inside)
+        return lambda translator, receiver, args, equivalent: args[index]
+    elif inside == 'self':
+        if is_function:
+            raise PseudoDSLError('%{self} not working for functions with api dsl')
+
+        def self_part(translator, receiver, args, equivalent):
+            if receiver:
+                return receiver
+            else:
+                raise PseudoDSLError('%{self} not working for functions with api dsl')
+        return self_part
+    elif inside == 'equivalent':
+        return lambda translator, receiver, args, equivalent: typename(equivalent)
+    else:
+        placeholder = '%s_placeholder' % inside
+        if translator and not hasattr(translator, placeholder):
+            raise PseudoDSLError('%s: %s has no %s' % (api, translator.__name__, placeholder))
+        return lambda translator, receiver, args, equivalent: getattr(translator, placeholder)(receiver, *args, equivalent=equivalent)
+
+
+def compile_tables(translator):
+    '''
+    compile the methods and functions tables of a translator class
+
+    returns a dict entry => expand function, called on class creation,
+    so dsl errors are raised on import
+    (None entries are methods without a translation yet, they fail only when used)
+    '''
+
+    expanders = {}
+    for table, is_function in ((getattr(translator, 'methods', {}), False), (getattr(translator, 'functions', {}), True)):
+        for entries in table.values():
+            for name, api in entries.items():
+                if name[0] == '@' or api is None or isinstance(api, type) and issubclass(api, LeakingNode):
+                    continue
+                try:
+                    expanders[api] = compile_api(api, translator, is_function)
+                except PseudoDSLError as e:
+                    raise PseudoDSLError('%s.%s: %s' % (translator.__name__, name, e))
+    return expanders
+
+
 class ApiTranslator(TreeTransformer):
     '''
     A base class for the api translators
@@ -73,15 +189,35 @@ class ApiTranslator(TreeTransformer):
                  which helps with call nodes with normal `local` name callees
     '''
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._expanders = compile_tables(cls)
+
     def __init__(self, tree):
-        self.tree = copy.deepcopy(tree)
+        self.tree = tree # not changed, the translated tree shares the unchanged nodes with it
 
     def api_translate(self):
         self.standard_dependencies = set()
         self.used = set()
+        transformed = self.translate()
+        transformed.dependencies = self.module_dependencies()
+        return transformed
+
+    def translate(self):
+        '''
+        the translated tree without the dependencies of the module
+
+        the names it uses are added to self.used and self.standard_dependencies,
+        module_dependencies turns them into dependency nodes
+        '''
         self.leaked_nodes = []
         transformed = self.transform(self.tree)
+        if self.copy_on_write:
+            transformed = copy_node(transformed)
+        return transformed
 
+    def module_dependencies(self):
+        '''the dependency nodes for self.used and self.standard_dependencies'''
         for l in self.used:
             m = self.dependencies.get(l, {}).get('@all')
             if m:
@@ -89,11 +225,8 @@ class ApiTranslator(TreeTransformer):
                     self.standard_dependencies |= set(m)
                 else:
                     self.standard_dependencies.add(m)
-        
-        transformed.dependencies = [
-            Node('dependency', name=name) for name in self.standard_dependencies]
 
-        return transformed
+        return [Node('dependency', name=name) for name in self.standard_dependencies]
 
     def after(self, node, in_block, assignment):
         if node and not isinstance(node, Node):
@@ -249,59 +382,18 @@ class ApiTranslator(TreeTransformer):
         the heart of api translation dsl
 
         function or <z>(<arg>, ..) can be expanded, <z> can be just a name for a global function, or #name for method, <arg> can be %{self} for self or %{n} for nth arg
+
+        the entries are compiled once per class by `compile_api`: the tables when the class
+        is created, other entries(from translate_* methods) on their first use
         '''
 
-        if callable(api):
-            if receiver:
-                return api(receiver, *(args + [pseudo_type]))
-            else:
-                return api(*(args + [pseudo_type]))
-        elif isinstance(api, str):
-            if '(' in api:
-                call_api, arg_code = api[:-1].split('(')
-                args = [self._parse_part(
-                    a.strip(), receiver, args, equivalent) for a in arg_code.split(',')]
-            else:
-                call_api, arg_code = api, ''
-            if '#' in call_api:
-                a, b = call_api.split('#')
-                method_receiver = self._parse_part(
-                    a, receiver, args, equivalent) if a else receiver
-                return method_call(method_receiver, b, args, pseudo_type=pseudo_type)
-            elif '.' in call_api:
-                a, b = call_api.split('.')
-                static_receiver = self._parse_part(
-                    a, receiver, args, equivalent) if a else receiver
-                if b[-1] != '!':
-                    return Node('static_call', receiver=static_receiver, message=b, args=args, pseudo_type=pseudo_type)
-                else:
-                    return Node('attr', object=static_receiver, attr=b[:-1], pseudo_type=pseudo_type)
-            else:
-                if receiver:
-                    return call(call_api, [receiver] + args, pseudo_type=pseudo_type)
-                else:
-                    return call(call_api, args, pseudo_type=pseudo_type)
-        else:
-            raise PseudoDSLError('%s not supported by api dsl' % str(api))
-
-    def _parse_part(self, part, receiver, args, equivalent):
-        if part[0] == '%':  # %{v}
-            inside = part[2:-1]
-            if inside.isnumeric():
-                inside = int(inside)
-                return args[inside]
-            elif inside == 'self':
-                if receiver:
-                    return receiver
-                else:
-                    raise PseudoDSLError(
-                        '%{self} not working for functions with api dsl')
-            elif inside == 'equivalent':
-                return typename(equivalent)
-            else:
-                return getattr(self, '%s_placeholder' % inside)(receiver, *args, equivalent=equivalent)
-        else:
-            return local(part)
+        hashable = isinstance(api, str) or callable(api)
+        expand = self._expanders.get(api) if hashable else None
+        if expand is None:
+            expand = compile_api(api)
+            if hashable:
+                self._expanders[api] = expand
+        return expand(self, receiver, args, pseudo_type, equivalent)
 
     def update_used(self, t):
         if isinstance(t, list):
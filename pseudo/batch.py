@@ -0,0 +1,182 @@
+# translating many files to many languages in parallel
+import collections
+import glob
+import os
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+import pseudo
+import pseudo.cache
+import pseudo.loader
+
+INTERMEDIATE_EXTENSIONS = ('.pseudo.yaml', '.pseudo.bin')
+
+
+def input_files(patterns):
+    '''
+    the files for a list of filenames, directories and glob patterns
+
+    directories are searched recursively only for intermediate files:
+    the outputs of a previous run next to its inputs are source files too,
+    so source files have to be listed or matched by a pattern, the result is sorted
+    '''
+
+    files = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for directory, _, filenames in os.walk(pattern):
+                files.update(os.path.join(directory, f) for f in filenames if f.endswith(INTERMEDIATE_EXTENSIONS))
+        elif os.path.isfile(pattern):
+            files.add(pattern)
+        else:
+            files.update(f for f in glob.glob(pattern, recursive=True) if os.path.isfile(f))
+    return sorted(files)
+
+
+def output_filename(filename, language, output_dir=None, root=None):
+    '''
+    <base>.<language extension> next to filename,
+    or under output_dir with the same path relative to root
+    '''
+
+    for extension in INTERMEDIATE_EXTENSIONS:
+        if filename.endswith(extension):
+            base = filename[:-len(extension)]
+            break
+    else:
+        base = filename.rpartition('.')[0]
+    if output_dir:
+        base = os.path.join(output_dir, os.path.relpath(base, root or os.curdir))
+    return '%s.%s' % (base, pseudo.FILE_EXTENSIONS[language])
+
+
+_caches = {} # cache directory => TranslationCache, one per worker
+_trees = collections.OrderedDict() # (filename, mtime, size) => tree, the last TREE_CACHE_SIZE loaded by a worker
+TREE_CACHE_SIZE = 8
+
+
+def translate_file(filename, language, output, cache_dir=None):
+    '''
+    translate a file to a language and write the output to the output filename
+
+    the jobs for the other languages of the file usually run in the same worker right after,
+    so the last loaded trees are kept
+    with cache_dir, the generated code is cached there(see pseudo.cache)
+    returns (filename, [output filename], [(language or None, error)])
+    '''
+
+    try:
+        tree = _load(filename)
+    except Exception as e:
+        return filename, [], [(None, _error_message(e))]
+
+    cache = None
+    if cache_dir:
+        if cache_dir not in _caches:
+            _caches[cache_dir] = pseudo.cache.TranslationCache(directory=cache_dir)
+        cache = _caches[cache_dir]
+    try:
+        code = pseudo.generate(tree, language, cache=cache)
+        if os.path.dirname(output):
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, 'w') as f:
+            f.write(code)
+    except Exception as e:
+        return filename, [], [(language, _error_message(e))]
+    return filename, [output], []
+
+
+def _load(filename):
+    stat = os.stat(filename)
+    key = filename, stat.st_mtime_ns, stat.st_size
+    if key in _trees:
+        _trees.move_to_end(key)
+        return _trees[key]
+    tree = _trees[key] = pseudo.loader.as_tree(pseudo.loader.load_input(filename, subprocess.call))
+    while len(_trees) > TREE_CACHE_SIZE:
+        _trees.popitem(last=False)
+    return tree
+
+
+def _error_message(e):
+    # exceptions aren't always picklable, so workers return messages
+    return '%s: %s' % (type(e).__name__, e)
+
+
+class BatchResult:
+    '''the outputs and the errors of a batch'''
+
+    def __init__(self):
+        self.outputs = []
+        self.errors = [] # (filename, language or None, error)
+
+    def add(self, filename, outputs, errors):
+        self.outputs.extend(outputs)
+        for language, error in errors:
+            # each job of a file which can't be loaded reports it
+            if language is not None or (filename, None, error) not in self.errors:
+                self.errors.append((filename, language, error))
+
+    def report(self):
+        lines = ['%d files written, %d errors' % (len(self.outputs), len(self.errors))]
+        for filename, language, error in self.errors:
+            lines.append('  %s [%s] %s' % (filename, language or 'load', error))
+        return '\n'.join(lines)
+
+
+def jobs(files, languages, output_dir=None, root=None):
+    '''
+    (filename, language, output filename) for each file and language, and the errors
+    (filename, language, error) for the outputs which would overwrite an input or another output
+
+    aliases of a language(py and python) are translated once
+    '''
+
+    extensions = {}
+    for language in languages:
+        extensions.setdefault(pseudo.FILE_EXTENSIONS[language], language)
+    inputs = {os.path.abspath(filename) for filename in files}
+    outputs, result, errors = {}, [], []
+    for filename in files:
+        for language in extensions.values():
+            output = output_filename(filename, language, output_dir, root)
+            path = os.path.abspath(output)
+            if path in inputs:
+                errors.append((filename, language, '%s is an input' % output))
+            elif path in outputs:
+                errors.append((filename, language, '%s is the output of %s too' % (output, outputs[path])))
+            else:
+                outputs[path] = filename
+                result.append((filename, language, output))
+    return result, errors
+
+
+def run_batch(patterns, languages, workers=None, output_dir=None, cache_dir=None):
+    '''
+    translate all the files matching patterns to each of the languages
+
+    each (file, language) is a job for a pool of workers(processes, os.cpu_count() by default,
+    workers=1 translates everything in this process)
+    the outputs are written next to the inputs or under output_dir
+    with the same layout as the inputs, outputs which collide with an input
+    or with another output(a.pseudo.yaml and a.pseudo.bin) are errors and aren't written
+    cache_dir is an optional on-disk translation cache shared by the workers
+
+    returns a BatchResult
+    '''
+
+    files = input_files(patterns)
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(f)) for f in files]) if files else None
+    todo, collisions = jobs(files, languages, output_dir, root)
+    result = BatchResult()
+    if workers == 1:
+        for filename, language, output in todo:
+            result.add(*translate_file(filename, language, output, cache_dir))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(translate_file, filename, language, output, cache_dir)
+                       for filename, language, output in todo]
+            for future in futures:
+                result.add(*future.result())
+    result.errors.extend(collisions)
+    return result
@@ -0,0 +1,290 @@
+# timing each stage of the pipeline, python -m pseudo.benchmark --help
+import argparse
+import gc
+import glob
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import pseudo
+import pseudo.loader
+from pseudo.pseudo_tree import Node, to_node, local, call, assignment, count_nodes
+
+BENCHMARK_VERSION = 1
+LANGUAGES = ['py', 'rb', 'js', 'cs', 'cpp', 'go', 'php']
+SIZES = [10, 100]
+
+# a fresh interpreter importing pseudo and generating a small module for a language
+STARTUP_SCRIPT = '''
+import pseudo
+from pseudo.pseudo_tree import Node, to_node, local, assignment
+main = [assignment(local('x', 'Int'), Node('binary_op', op='+', left=to_node(2), right=to_node(3), pseudo_type='Int'))]
+pseudo.generate(Node('module', dependencies=[], constants=[], custom_exceptions=[], definitions=[], main=main), %r)
+'''
+
+
+def synthetic_module(size):
+    '''a module with size functions, each with arithmetic, an if chain and a loop, called in main'''
+
+    definitions, main = [], []
+    for j in range(size):
+        name = 'f%d' % j
+        a, b, x = local('a', 'Int'), local('b', 'Int'), local('x', 'Int')
+        definitions.append(Node('function_definition',
+            name=name,
+            params=[a, b],
+            pseudo_type=['Function', 'Int', 'Int', 'Int'],
+            return_type='Int',
+            block=[
+                assignment(x, Node('binary_op', op='+', left=a,
+                    right=Node('binary_op', op='*', left=b, right=to_node(j), pseudo_type='Int'), pseudo_type='Int')),
+                Node('if_statement',
+                    test=Node('comparison', op='>', left=x, right=to_node(100), pseudo_type='Boolean'),
+                    block=[Node('standard_call', namespace='io', function='display', args=[x], pseudo_type='Void')],
+                    otherwise=Node('elseif_statement',
+                        test=Node('comparison', op='<', left=x, right=to_node(0), pseudo_type='Boolean'),
+                        block=[Node('standard_call', namespace='io', function='display', args=[to_node('negative')], pseudo_type='Void')],
+                        otherwise=Node('else_statement', block=[
+                            Node('standard_call', namespace='io', function='display', args=[a], pseudo_type='Void')]))),
+                Node('for_range_statement',
+                    index=local('k', 'Int'),
+                    first=to_node(0),
+                    last=b,
+                    step=to_node(1),
+                    block=[Node('standard_call', namespace='io', function='display', args=[local('k', 'Int')], pseudo_type='Void')]),
+                Node('implicit_return', value=x, pseudo_type='Int')
+            ]))
+        main.append(Node('standard_call', namespace='io', function='display', pseudo_type='Void',
+                         args=[call(local(name, ['Function', 'Int', 'Int', 'Int']), [to_node(j), to_node(2)], 'Int')]))
+    return Node('module', dependencies=[], constants=[], custom_exceptions=[], definitions=definitions, main=main)
+
+
+def inputs(example_dir='examples', sizes=SIZES):
+    '''(name, source) for the example files and the synthetic modules(as yaml)'''
+
+    result = []
+    for filename in sorted(glob.glob(os.path.join(example_dir, '*.yaml'))):
+        with open(filename) as f:
+            result.append((os.path.basename(filename), f.read()))
+    for size in sizes:
+        result.append(('synthetic_%d' % size, pseudo.loader.as_yaml(synthetic_module(size))))
+    return result
+
+
+def measure(function, repeat):
+    '''(best time in seconds, peak memory in bytes, result) of function()'''
+
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    # tracemalloc slows everything down, so memory has its own run
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak, result
+
+
+def stage(seconds, peak, nodes):
+    return {
+        'seconds': seconds,
+        'nodes_per_second': nodes / seconds if seconds else None,
+        'peak_bytes': peak
+    }
+
+
+def benchmark_source(source, languages=LANGUAGES, repeat=3):
+    '''
+    the results for a source: nodes, parse and for each language
+    api_translate, a stage for each middleware and emit(template expansion)
+    '''
+
+    seconds, peak, tree = measure(lambda: pseudo.loader.as_tree(source), repeat)
+    nodes = count_nodes(tree)
+    result = {'nodes': nodes, 'parse': stage(seconds, peak, nodes), 'languages': {}}
+    for language in languages:
+        stages = {}
+        try:
+            seconds, peak, translated = measure(lambda: pseudo.API_TRANSLATORS[language](tree).api_translate(), repeat)
+            stages['api_translate'] = stage(seconds, peak, nodes)
+            generator_class = pseudo.GENERATORS[language]
+            for middleware in generator_class.middlewares:
+                seconds, peak, translated = measure(lambda: middleware.process(translated), repeat)
+                stages['middleware:%s' % getattr(middleware, '__name__', type(middleware).__name__)] = stage(seconds, peak, nodes)
+
+            def emit():
+                generator = generator_class()
+                generator.middlewares = [] # already applied
+                generator.generate_to(translated, io.StringIO())
+
+            seconds, peak, _ = measure(emit, repeat)
+            stages['emit'] = stage(seconds, peak, nodes)
+        except Exception as e:
+            stages['error'] = '%s: %s' % (type(e).__name__, e)
+        result['languages'][language] = stages
+    return result
+
+
+def startup(languages=LANGUAGES, repeat=3):
+    '''
+    the best wall time of a fresh interpreter generating code for each language
+    and of an empty one(interpreter), in seconds, None if it fails
+    '''
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')])))
+    env.pop('PSEUDO_WARM_UP', None)
+
+    def best(script):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            if subprocess.run([sys.executable, '-c', script], env=env, stderr=subprocess.DEVNULL).returncode:
+                return None
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    result = {'interpreter': best('pass')}
+    for language in languages:
+        result[language] = best(STARTUP_SCRIPT % language)
+    return result
+
+
+def run(example_dir='examples', sizes=SIZES, languages=LANGUAGES, repeat=3, startup_languages=LANGUAGES):
+    '''
+    a baseline: the results for each input and the startup times with the environment
+
+    inputs which can't be parsed or translated to any of the languages measure nothing,
+    they're in skipped(name => the reason) instead of results
+    '''
+
+    results, skipped = {}, {}
+    for name, source in inputs(example_dir, sizes):
+        try:
+            result = benchmark_source(source, languages, repeat)
+        except Exception as e:
+            skipped[name] = "can't be parsed: %s: %s" % (type(e).__name__, e)
+            continue
+        errors = [stages['error'] for stages in result['languages'].values() if 'error' in stages]
+        if errors and len(errors) == len(result['languages']):
+            skipped[name] = 'fails for every language, e.g. %s' % errors[0]
+        else:
+            results[name] = result
+    return {
+        'version': BENCHMARK_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+        'skipped': skipped,
+        'startup': startup(startup_languages, repeat) if startup_languages else {}
+    }
+
+
+def compare(baseline, current, threshold=1.2):
+    '''
+    (input, language or None, stage, baseline seconds, current seconds) for each stage
+    slower than threshold times its time in the baseline
+
+    a language which fails now but not in the baseline is a regression too:
+    (input, language, 'error', None, the error), and so is an input which is skipped now
+    '''
+
+    regressions = []
+    for name, reason in current.get('skipped', {}).items():
+        if name in baseline['results']:
+            regressions.append((name, None, 'error', None, reason))
+    for name, result in current['results'].items():
+        old = baseline['results'].get(name)
+        if old is None:
+            continue
+        pairs = [(None, 'parse', old['parse'], result['parse'])]
+        for language, stages in result['languages'].items():
+            old_stages = old['languages'].get(language, {})
+            if 'error' in stages and old_stages and 'error' not in old_stages:
+                regressions.append((name, language, 'error', None, stages['error']))
+            pairs.extend((language, s, old_stages[s], values) for s, values in stages.items()
+                         if s != 'error' and isinstance(old_stages.get(s), dict))
+        for language, s, old_values, values in pairs:
+            if values['seconds'] > old_values['seconds'] * threshold:
+                regressions.append((name, language, s, old_values['seconds'], values['seconds']))
+    old_startup = baseline.get('startup', {})
+    for language, seconds in current.get('startup', {}).items():
+        if seconds and old_startup.get(language) and seconds > old_startup[language] * threshold:
+            regressions.append(('startup', language, 'startup', old_startup[language], seconds))
+    return regressions
+
+
+def report(baseline):
+    lines = []
+    for name, reason in baseline.get('skipped', {}).items():
+        lines.append('%s: skipped, %s' % (name, reason))
+    for name, result in baseline['results'].items():
+        lines.append('%s: %d nodes' % (name, result['nodes']))
+        lines.append('  %-44s %s' % ('parse', _format_stage(result['parse'])))
+        for language, stages in result['languages'].items():
+            if 'error' in stages:
+                lines.append('  %-44s %s' % (language, stages['error']))
+            for s, values in stages.items():
+                if s != 'error':
+                    lines.append('  %-44s %s' % ('%s %s' % (language, s), _format_stage(values)))
+    if baseline.get('startup'):
+        lines.append('startup:')
+        for language, seconds in baseline['startup'].items():
+            lines.append('  %-44s %s' % (language, 'failed' if seconds is None else '%9.2fms' % (seconds * 1000)))
+    return '\n'.join(lines)
+
+
+def _format_stage(values):
+    return '%9.2fms %12.0f nodes/s %10.1fKB' % (
+        values['seconds'] * 1000, values['nodes_per_second'] or 0, values['peak_bytes'] / 1024)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m pseudo.benchmark',
+                                     description='time each stage of pseudo for the examples and synthetic modules')
+    parser.add_argument('--examples', default='examples', help='a directory with .yaml files')
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)), help='the number of functions in the synthetic modules')
+    parser.add_argument('--languages', default=','.join(LANGUAGES))
+    parser.add_argument('--startup', default=','.join(LANGUAGES),
+                        help='the languages for the startup benchmark, a fresh interpreter for each run, empty to skip it')
+    parser.add_argument('--repeat', type=int, default=3, help='the best of repeat runs is reported')
+    parser.add_argument('--save', help='save the results as a json baseline')
+    parser.add_argument('--compare', help='compare with a json baseline, exit with 1 on regressions')
+    parser.add_argument('--threshold', type=float, default=1.2, help='a stage slower than threshold * baseline is a regression')
+    options = parser.parse_args(args)
+
+    sizes = [int(size) for size in options.sizes.split(',') if size]
+    startup_languages = [language for language in options.startup.split(',') if language]
+    current = run(options.examples, sizes, options.languages.split(','), options.repeat, startup_languages)
+    print(report(current))
+    if options.save:
+        with open(options.save, 'w') as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, current, options.threshold)
+        for name, language, s, old, new in regressions:
+            if s == 'error':
+                print('regression: %s %s fails: %s' % (name, language or '', new))
+            else:
+                print('regression: %s %s %s %.2fms => %.2fms' % (name, language or '', s, old * 1000, new * 1000))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
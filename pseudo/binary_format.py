@@ -0,0 +1,225 @@
+# a compact binary format for pseudo trees, an alternative to .pseudo.yaml
+import struct
+from pseudo.pseudo_tree import Node, empty_node
+from pseudo.errors import PseudoBinaryFormatError
+
+MAGIC = b'PSDB'
+VERSION = 1
+
+# <magic> <version: u8> <value>
+#
+# value:
+#   N | T | F               None / True / False
+#   I <i64>                 int
+#   J <u32> <ascii>         int which doesn't fit in 64 bits
+#   D <f64>                 float
+#   S <u32> <utf8>          a new string, gets the next index in the string table
+#   R <u32>                 a string from the table
+#   L <u32> <value>*        list
+#   M <u32> (<value> <value>)*              dict
+#   O <type: string> <u32> (<name: string> <value>)*   node
+#
+# strings are interned: node types, field names and repeating values are written once
+
+HEADER = struct.Struct('>4sB')
+U32 = struct.Struct('>I')
+I64 = struct.Struct('>q')
+F64 = struct.Struct('>d')
+
+I64_MIN, I64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def dumps(tree):
+    '''
+    the binary representation of a tree(bytes)
+
+    the tree is walked with an explicit stack, so deep trees don't hit the recursion limit
+    '''
+
+    chunks = [HEADER.pack(MAGIC, VERSION)]
+    append = chunks.append
+    strings = {}
+
+    def dump_string(value):
+        index = strings.get(value)
+        if index is None:
+            strings[value] = len(strings)
+            encoded = value.encode('utf-8')
+            append(b'S' + U32.pack(len(encoded)))
+            append(encoded)
+        else:
+            append(b'R' + U32.pack(index))
+
+    # the values left to dump, the last one is next
+    stack = [tree]
+    pop, extend = stack.pop, stack.extend
+    while stack:
+        value = pop()
+        if isinstance(value, Node):
+            fields = value.fields()
+            append(b'O')
+            dump_string(value.type)
+            append(U32.pack(len(fields) - 1))
+            for field, child in reversed(fields[1:]):
+                extend((child, field))
+        elif isinstance(value, str):
+            dump_string(value)
+        elif isinstance(value, list):
+            append(b'L' + U32.pack(len(value)))
+            extend(reversed(value))
+        elif value is None:
+            append(b'N')
+        elif value is True:
+            append(b'T')
+        elif value is False:
+            append(b'F')
+        elif isinstance(value, int):
+            if I64_MIN <= value <= I64_MAX:
+                append(b'I' + I64.pack(value))
+            else:
+                encoded = str(value).encode('ascii')
+                append(b'J' + U32.pack(len(encoded)))
+                append(encoded)
+        elif isinstance(value, float):
+            append(b'D' + F64.pack(value))
+        elif isinstance(value, dict):
+            append(b'M' + U32.pack(len(value)))
+            for k, v in reversed(list(value.items())):
+                extend((v, k))
+        else:
+            raise PseudoBinaryFormatError("can't serialize %s" % type(value).__name__)
+
+    return b''.join(chunks)
+
+
+_NO_KEY, _LIST = object(), object()
+
+
+def loads(data):
+    '''
+    a tree from its binary representation
+
+    the nodes, lists and dicts being filled are kept on an explicit stack,
+    so deep trees don't hit the recursion limit
+    '''
+
+    if len(data) < HEADER.size:
+        raise PseudoBinaryFormatError('not a pseudo binary file')
+    magic, version = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise PseudoBinaryFormatError('not a pseudo binary file')
+    if version != VERSION:
+        raise PseudoBinaryFormatError('unsupported pseudo binary version %d' % version)
+
+    strings = []
+    unpack_u32 = U32.unpack_from
+    position = HEADER.size
+    end = len(data)
+    # [container, items left, the current field or key(_LIST for lists, _NO_KEY before a key)]
+    stack = []
+
+    try:
+        while True:
+            tag = data[position]
+            position += 1
+            if tag == 82: # R
+                value = strings[unpack_u32(data, position)[0]]
+                position += 4
+            elif tag == 79: # O
+                tag = data[position]
+                position += 1
+                if tag == 82: # R
+                    node_type = strings[unpack_u32(data, position)[0]]
+                    position += 4
+                elif tag == 83: # S
+                    length, = unpack_u32(data, position)
+                    position += 4
+                    if position + length > end:
+                        raise IndexError(position)
+                    node_type = data[position:position + length].decode('utf-8')
+                    position += length
+                    strings.append(node_type)
+                else:
+                    raise PseudoBinaryFormatError('invalid node type tag %r at %d' % (chr(tag), position - 1))
+                count, = unpack_u32(data, position)
+                position += 4
+                value = empty_node(node_type)
+                value.type = node_type
+                if count:
+                    stack.append([value, count, _NO_KEY])
+                    continue
+            elif tag == 83: # S
+                length, = unpack_u32(data, position)
+                position += 4
+                if position + length > end:
+                    raise IndexError(position)
+                value = data[position:position + length].decode('utf-8')
+                position += length
+                strings.append(value)
+            elif tag == 76: # L
+                count, = unpack_u32(data, position)
+                position += 4
+                value = []
+                if count:
+                    stack.append([value, count, _LIST])
+                    continue
+            elif tag == 73: # I
+                value, = I64.unpack_from(data, position)
+                position += 8
+            elif tag == 78: # N
+                value = None
+            elif tag == 84: # T
+                value = True
+            elif tag == 70: # F
+                value = False
+            elif tag == 68: # D
+                value, = F64.unpack_from(data, position)
+                position += 8
+            elif tag == 77: # M
+                count, = unpack_u32(data, position)
+                position += 4
+                value = {}
+                if count:
+                    stack.append([value, count, _NO_KEY])
+                    continue
+            elif tag == 74: # J
+                length, = unpack_u32(data, position)
+                position += 4
+                if position + length > end:
+                    raise IndexError(position)
+                value = int(data[position:position + length].decode('ascii'))
+                position += length
+            else:
+                raise PseudoBinaryFormatError('invalid tag %r at %d' % (chr(tag), position - 1))
+
+            # put the value in its container, and the finished containers in theirs
+            while stack:
+                frame = stack[-1]
+                key = frame[2]
+                if key is _NO_KEY:
+                    frame[2] = value
+                    break
+                container = frame[0]
+                if key is _LIST:
+                    container.append(value)
+                elif container.__class__ is dict:
+                    container[key] = value
+                    frame[2] = _NO_KEY
+                else:
+                    setattr(container, key, value)
+                    frame[2] = _NO_KEY
+                left = frame[1] - 1
+                if left:
+                    frame[1] = left
+                    break
+                stack.pop()
+                value = container
+            else:
+                break
+    except (IndexError, struct.error): # the slices are checked too
+        raise PseudoBinaryFormatError('truncated pseudo binary file')
+    except ValueError as e: # a string which isn't utf-8, an int which isn't ascii digits
+        raise PseudoBinaryFormatError('invalid value in pseudo binary file: %s' % e)
+    if position != end:
+        raise PseudoBinaryFormatError('trailing data after the tree')
+    return value
@@ -0,0 +1,197 @@
+# a cache for generated code, keyed by the tree, the language and the pseudo code
+import collections
+import hashlib
+import os
+import threading
+
+import pseudo.binary_format
+
+# change when the layout of the cache changes
+CACHE_VERSION = 1
+
+_source_hash = None
+
+
+def tree_hash(tree):
+    '''a stable structural hash of a tree(hex str)'''
+
+    return hashlib.sha256(pseudo.binary_format.dumps(tree)).hexdigest()
+
+
+def source_hash():
+    '''
+    a hash of the source of the pseudo package
+
+    pseudo doesn't have a release version, and the output depends on
+    the templates, the api translations and the middlewares, so any change in
+    the package source invalidates the cache
+    '''
+
+    global _source_hash
+    if _source_hash is None:
+        root = os.path.dirname(os.path.abspath(__file__))
+        h = hashlib.sha256()
+        for directory, directories, filenames in sorted(os.walk(root)):
+            directories.sort()
+            for filename in sorted(filenames):
+                if filename.endswith('.py'):
+                    path = os.path.join(directory, filename)
+                    h.update(os.path.relpath(path, root).encode('utf-8'))
+                    with open(path, 'rb') as f:
+                        h.update(f.read())
+        _source_hash = h.hexdigest()
+    return _source_hash
+
+
+def class_version(cls):
+    '''the name of cls and of its bases, with their optional cache_version attributes'''
+
+    return ','.join('%s.%s:%s' % (c.__module__, c.__qualname__, c.__dict__.get('cache_version', ''))
+                    for c in cls.__mro__)
+
+
+class TranslationCache:
+    '''
+    generated code for (tree, language)
+
+    a bounded LRU in memory and optionally a directory on disk,
+    evicted(least recently used first) when its size is over max_bytes
+
+    the size of the directory is tracked with the writes of this cache,
+    the directory is scanned again only when it's over max_bytes or
+    every rescan_writes writes: it can be shared by several processes(the batch workers),
+    the scan picks up their files and skips the files they remove
+
+    the key includes the translator and the generator classes
+    and the pseudo source, so a changed pseudo never gets old output
+
+    it can be shared by threads(e.g. with agenerate), the files are read
+    and written outside of the lock
+    '''
+
+    def __init__(self, max_entries=256, directory=None, max_bytes=64 * 1024 * 1024, rescan_writes=64):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.rescan_writes = rescan_writes
+        self.entries = collections.OrderedDict()
+        self.hits = self.misses = 0
+        self.lock = threading.Lock()
+        self.evict_lock = threading.Lock() # one scan at a time
+        self.writes = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.disk_size = sum(size for _, _, size in self._disk_entries())
+
+    def key(self, tree, language, tree_digest=None):
+        '''the key for a tree: tree_digest can be a precomputed tree_hash(tree)'''
+
+        translator, generator = pseudo.API_TRANSLATORS[language], pseudo.GENERATORS[language]
+        h = hashlib.sha256()
+        for part in (str(CACHE_VERSION), source_hash(), class_version(translator), class_version(generator),
+                     tree_digest or tree_hash(tree)):
+            h.update(part.encode('utf-8'))
+            h.update(b'\0')
+        return h.hexdigest()
+
+    def get(self, key):
+        '''the cached code for key or None'''
+
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            if not self.directory:
+                self.misses += 1
+                return None
+        path = os.path.join(self.directory, key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                code = f.read()
+            os.utime(path)
+        except OSError:
+            code = None
+        with self.lock:
+            if code is None:
+                self.misses += 1
+            else:
+                self._remember(key, code)
+                self.hits += 1
+        return code
+
+    def set(self, key, code):
+        with self.lock:
+            self._remember(key, code)
+        if not self.directory:
+            return
+        import tempfile # only for the disk tier
+
+        path = os.path.join(self.directory, key)
+        fd, temp = tempfile.mkstemp(dir=self.directory, prefix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(code)
+        size = os.path.getsize(temp)
+        try:
+            size -= os.path.getsize(path) # replaced
+        except OSError:
+            pass
+        os.replace(temp, path)
+        with self.lock:
+            self.disk_size += size
+            self.writes += 1
+            rescan = self.disk_size > self.max_bytes or self.writes % self.rescan_writes == 0
+        if rescan:
+            self._evict()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+        if self.directory:
+            with self.evict_lock:
+                for path, _, _ in self._disk_entries():
+                    _remove(path)
+                with self.lock:
+                    self.disk_size = 0
+
+    def _remember(self, key, code):
+        self.entries[key] = code
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def _disk_entries(self):
+        # (path, mtime, size) for each cached file
+        for name in os.listdir(self.directory):
+            if not name.startswith('.tmp'):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError: # evicted by another process
+                    continue
+                yield path, stat.st_mtime, stat.st_size
+
+    def _evict(self):
+        # scans the directory for the real size(the other processes write to it too)
+        # and removes the oldest files while it's over max_bytes
+        if not self.evict_lock.acquire(blocking=False):
+            return # another thread is scanning
+        try:
+            entries = sorted(self._disk_entries(), key=lambda entry: entry[1])
+            disk_size = sum(size for _, _, size in entries)
+            for path, _, size in entries:
+                if disk_size <= self.max_bytes:
+                    break
+                _remove(path)
+                disk_size -= size
+            with self.lock:
+                self.disk_size = disk_size
+        finally:
+            self.evict_lock.release()
+
+
+def _remove(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError: # removed by another process
+        pass
@@ -1,25 +1,143 @@
 # base generator with common functionality
+import functools
+import io
 import re
 from pseudo.pseudo_tree import Node
-from pseudo.code_generator_dsl import Placeholder, Newline, Action, Function, SubTemplate, SubElement, PseudoType, Whitespace, Offset, INTERNAL_WHITESPACE, NEWLINE
+from pseudo.code_generator_dsl import Placeholder, Newline, Action, Function, SubTemplate, SubElement, PseudoType, Whitespace, Offset, INTERNAL_WHITESPACE, NEWLINE, Iterable, end_line
+from pseudo.code_generator_compiler import compile_templates
+from pseudo.code_generator_writer import ModuleWriter
+from pseudo.middlewares.fused_middleware import FusedMiddleware
+from pseudo.tree_transformer import iterative_walks, shared_masks
+from pseudo.helpers import dispatch_table
 
-PASS_REGEX = re.compile(r'\n[ \t]*\n([ \t]*pass)')
 LINE_FIRS = re.compile(r'^( +)')
 
+# generator class => (templates, indent, use_spaces, parsed templates)
+# parsed templates are shared by all the instances of a generator
+_TEMPLATE_CACHE = {}
+# (generator class, iterative) => (parsed templates, render functions)
+_COMPILED_CACHE = {}
+
+class Fragments(list):
+    '''
+    the fragments of a template expanded by CodeGenerator._expand_template
+
+    they're joined by _generate_from_template
+    '''
+
+    def __init__(self, generator):
+        self.generator = generator
+
+    def expand(self, element, node, depth):
+        # a placeholder, an action or a function of the template
+        if hasattr(element, 'expand'):
+            self.append(element.expand(self.generator, node, depth))
+        else:
+            self.append(element(self.generator, node, depth))
+
+
+class StreamedFragments(Fragments):
+    '''
+    fragments written to a stream as soon as a newline can't swallow them anymore:
+    after the first two, when a fragment doesn't start with whitespace
+
+    the written fragments are kept as their first letter, it's all end_line checks,
+    the items of list fields and of streamed actions are written one by one
+    '''
+
+    def __init__(self, generator, write):
+        self.generator = generator
+        self.write = write
+        self.written = 0
+
+    def append(self, fragment):
+        list.append(self, fragment)
+        if len(self) > 2 and fragment and fragment[0] != self.generator._symbol:
+            for j in range(self.written, len(self)):
+                self.write(self[j])
+                self[j] = self[j][:1]
+            self.written = len(self)
+
+    def expand(self, element, node, depth):
+        chunks = self.generator._list_chunks(element, node, depth)
+        if chunks is None:
+            Fragments.expand(self, element, node, depth)
+            return
+        first = next(chunks, '')
+        if len(self) >= 2 and first and first[0] != self.generator._symbol:
+            self.append(first)
+            for chunk in chunks:
+                self.write(chunk)
+        else:
+            self.append(first + ''.join(chunks))
+
+    def close(self):
+        for fragment in self[self.written:]:
+            self.write(fragment)
+
+
 class CodeGenerator:
     '''
     options:
       indent: the size of indent, example: python - 4, ruby - 2
       spaces: use spaces if true, tabs if false
+      compiled: render nodes with templates compiled to python functions
+                instead of interpreting the parsed templates, the output is the same
+      trace: a trace(event, stage, node, detail) callback for
+             'middleware' passes and 'enter', 'template' and 'exit' of each node
+      profile: a pseudo.profile.Profile collecting the time of each middleware pass and of emit
+      names: a dict filled with generated name => source name for the names
+             changed by the middlewares(see NameMiddleware)
+      iterative: walk the tree with an explicit stack instead of recursive calls,
+                 so deep trees don't hit the recursion limit(uses the compiled templates,
+                 ignored with trace)
+
+    consecutive fusable middlewares are applied in one walk(see FusedMiddleware),
+    unless fuse_middlewares is False
+
+    generate_to writes the parts of the top template(the dependencies, each definition
+    and each statement of a module) to a stream as they're generated,
+    unless stream_templates is False
+    generators which add code to self.a while generating set hoists_code
     '''
 
-    def __init__(self, indent=None, use_spaces=None):
+    compiled = False
+    trace = None
+    profile = None
+    names = None
+    iterative = False
+    fuse_middlewares = True
+    stream_templates = True
+    hoists_code = False
+    # actions which are action([item]) for each item joined with a separator
+    # generate_to writes them item by item
+    streamed_actions = {'lines': '', 'semi_lines': '', 'line_join': '\n', 'semi': '\n'}
+    _generate_handlers = {} # node type => generate_<node type> method, built once per class
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._generate_handlers = dispatch_table(cls, 'generate_', {'to'}) # generate_to isn't a handler
+
+    def __init__(self, indent=None, use_spaces=None, compiled=None, trace=None, iterative=None, profile=None, names=None):
         if indent: self.indent = indent
         if use_spaces: self.use_spaces = use_spaces
+        if compiled is not None: self.compiled = compiled
+        if trace is not None: self.trace = trace
+        if iterative is not None: self.iterative = iterative
+        if profile is not None: self.profile = profile
+        if names is not None: self.names = names
         # always init them in classes
         self._symbol = ' ' if self.use_spaces else '\t'
         self._single_indent = self._symbol * (self.indent)
-        self._parsed_templates = {k: self._parse_template(v, k) for k, v in self.templates.items()}
+        self._parsed_templates = self.parsed_templates()
+        if self.iterative and not self.trace:
+            self._renderers = self.compiled_templates(iterative=True)
+            self._generate_node = self._generate_iterative_node
+        elif self.compiled:
+            self._renderers = self.compiled_templates()
+            self._generate_node = self._generate_compiled_node
+        if self.trace:
+            self._generate_node = self._traced(self._generate_node)
         self.a = [] # additional code, lambdas etc
         # print('[]')
         # for z in self._parsed_templates['function_definition']:
@@ -29,23 +147,116 @@ class CodeGenerator:
         #         print(z)
         # input()
 
+    @classmethod
+    def parsed_templates(cls):
+        '''
+        the parsed templates of the generator class
+
+        they are parsed only once per class and shared by all its instances,
+        a class is reparsed only if its templates, indent or use_spaces change
+        '''
+        cached = _TEMPLATE_CACHE.get(cls)
+        if cached is None or cached[0] is not cls.templates or cached[1:3] != (cls.indent, cls.use_spaces):
+            parsed = {k: cls._parse_template(v, k) for k, v in cls.templates.items()}
+            cached = _TEMPLATE_CACHE[cls] = (cls.templates, cls.indent, cls.use_spaces, parsed)
+        return cached[3]
+
+    @classmethod
+    def compiled_templates(cls, iterative=False):
+        '''
+        the templates of the generator class compiled to render functions
+
+        compiled once per class like the parsed templates
+        '''
+        parsed = cls.parsed_templates()
+        cached = _COMPILED_CACHE.get((cls, iterative))
+        if cached is None or cached[0] is not parsed:
+            cached = _COMPILED_CACHE[cls, iterative] = (parsed, compile_templates(parsed, cls.__name__, iterative))
+        return cached[1]
+
     def generate(self, tree):
         '''
         generates code based on templates and gen functions
         defined in the <x> lang generator
         '''
-        for middleware in self.middlewares:
-            tree = middleware.process(tree) # changed in place!!
-        original = self._generate_node(tree)
-        # first n lines n dependencies
-        # after that additional code
-
-        if self.a and tree.type == 'module':
-            p = original.split('\n')
-            r = '\n'.join(p[:len(tree.dependencies)] + (['\n'] if tree.dependencies else []) + self.a + ['\n'] + p[len(tree.dependencies):]) + '\n'
+        stream = io.StringIO()
+        self.generate_to(tree, stream)
+        return stream.getvalue()
+
+    def generate_to(self, tree, stream):
+        '''
+        generates code like generate, but writes it to a text stream
+
+        the code isn't joined for the whole module: the parts of the module
+        are written as they're generated, the additional code(self.a)
+        is inserted after the dependencies when it's ready(see ModuleWriter)
+        '''
+        tree = self.apply_middlewares(tree)
+        if self.profile:
+            self.profile.run('emit', self.emit_to, tree, stream)
+        else:
+            self.emit_to(tree, stream)
+
+    def apply_middlewares(self, tree):
+        '''the tree processed by the middlewares of the generator'''
+        with iterative_walks(self.iterative), shared_masks():
+            middlewares = FusedMiddleware.passes(self.middlewares) if self.fuse_middlewares else self.middlewares
+            for middleware in middlewares:
+                if self.trace:
+                    self.trace('middleware', getattr(middleware, '__name__', type(middleware).__name__), tree, middleware)
+                process = middleware.process
+                if self.names is not None and getattr(middleware, 'renames', False):
+                    process = functools.partial(middleware.process, names=self.names)
+                if self.profile:
+                    name = 'middleware:%s' % getattr(middleware, '__name__', type(middleware).__name__)
+                    tree = self.profile.run(name, process, tree)
+                else:
+                    tree = process(tree) # copies only the changed nodes
+        return tree
+
+    def emit_to(self, tree, stream):
+        '''writes the code for a tree processed by apply_middlewares to a text stream'''
+        # empty blocks are expanded to pass by their templates
+        # there is no pass over the whole output
+        if tree.type == 'module':
+            # first n lines n dependencies
+            # after that additional code
+            module_writer = ModuleWriter(stream.write, len(tree.dependencies), self.hoists_code)
+            self._emit_node(tree, module_writer.write)
+            module_writer.close(self.a)
         else:
-            r = original
-        return re.sub(PASS_REGEX, r'\n\1', r)
+            self._emit_node(tree, stream.write)
+
+    def _emit_node(self, node, write):
+        template = self._parsed_templates.get(node.type)
+        if template is None or not self.stream_templates or self.trace:
+            write(self._generate_node(node))
+        else:
+            fragments = StreamedFragments(self, write)
+            self._expand_template(template, node, 0, fragments)
+            fragments.close()
+
+    def _list_chunks(self, element, node, depth):
+        # the code for a list placeholder or a streamed action in chunks, otherwise None
+        if isinstance(element, Action) and element.action in self.streamed_actions:
+            separator, action, args = self.streamed_actions[element.action], getattr(self, 'action_%s' % element.action), element.args
+        elif isinstance(element, Placeholder):
+            separator, action, args = '', self.action_lines, []
+        else:
+            return None
+        content = getattr(node, element.field)
+        if not isinstance(content, Iterable):
+            return None
+        return self._chunks(content, separator, action, args, depth)
+
+    def _chunks(self, content, separator, action, args, depth):
+        for j, child in enumerate(content):
+            code = self._generate_node(child, depth)
+            if j:
+                code = self.offset(depth) + code
+                if separator:
+                    yield separator
+            yield action([code], *(args + [depth]))
 
     def action_join(self, expanded, separator, depth):
         return separator.join(expanded)
@@ -133,15 +344,77 @@ class CodeGenerator:
         #     return self._generate_node(Node('block', block=node), depth)
         if not isinstance(node, Node):
             return node
-        elif node.type in self._parsed_templates:
-            return self._generate_from_template(self._parsed_templates[node.type], node, depth)
-        elif hasattr(self, 'generate_%s' % node.type):
-            return getattr(self, 'generate_%s' % node.type)(node, depth)
+        template = self._parsed_templates.get(node.type)
+        if template is not None:
+            return self._generate_from_template(template, node, depth)
+        handler = self._generate_handlers.get(node.type)
+        if handler:
+            return handler(self, node, depth)
         else:
-            print(node.y, node.__dict__)
             raise NotImplementedError("no action for %s" % node.type)
 
-    def _generate_from_template(self, template, node, depth):
+    def _generate_compiled_node(self, node, depth=0):
+        if not isinstance(node, Node):
+            return node
+        renderer = self._renderers.get(node.type)
+        if renderer:
+            return renderer(self, node, depth)
+        return CodeGenerator._generate_node(self, node, depth)
+
+    def _generate_iterative_node(self, node, depth=0):
+        # the render functions yield (child, depth) and get the code for it back,
+        # a loop over a stack of them generates the tree
+        if not isinstance(node, Node):
+            return node
+        renderer = self._renderers.get(node.type)
+        if renderer is None:
+            return CodeGenerator._generate_node(self, node, depth)
+        stack = [renderer(self, node, depth)]
+        code = None
+        while True:
+            try:
+                child, child_depth = stack[-1].send(code)
+            except StopIteration as e:
+                stack.pop()
+                if not stack:
+                    return e.value
+                code = e.value
+            else:
+                renderer = self._renderers.get(child.type)
+                if renderer is None: # generate_<type> methods can still recurse
+                    code = CodeGenerator._generate_node(self, child, child_depth)
+                else:
+                    stack.append(renderer(self, child, child_depth))
+                    code = None
+
+    def generate_generated_code(self, node, depth):
+        # node.node generated before(see pseudo.incremental), node.codes is
+        # (depth, len(self.a)) => (code, the additional code it adds)
+        key = depth, len(self.a)
+        if key in node.codes:
+            code, additional = node.codes[key]
+            self.a.extend(additional)
+        else:
+            # the python generator names the lambdas it adds to self.a by its length
+            start = len(self.a)
+            code = self._generate_node(node.node, depth)
+            node.codes[key] = code, self.a[start:]
+        return code
+
+    def _traced(self, generate_node):
+        def traced_generate_node(node, depth=0):
+            if not isinstance(node, Node):
+                return generate_node(node, depth)
+            self.trace('enter', 'generate', node, None)
+            template = self._parsed_templates.get(node.type)
+            if template is not None:
+                self.trace('template', 'generate', node, self._select_template(template, node))
+            result = generate_node(node, depth)
+            self.trace('exit', 'generate', node, result)
+            return result
+        return traced_generate_node
+
+    def _select_template(self, template, node):
         if isinstance(template, dict): # and type(self).__name__ == 'JsGenerator':
             if isinstance(template['_key'], str):
                 t = template.get(str(getattr(node, template['_key'])).lower())
@@ -151,53 +424,45 @@ class CodeGenerator:
             if t is None:
                 t = template['_otherwise']
             template = t
+        return template
 
-        expanded = []
-        print('T',depth, template)
-        # input()
+    def _generate_from_template(self, template, node, depth):
+        fragments = Fragments(self)
+        self._expand_template(template, node, depth, fragments)
+        return ''.join(fragments)
+
+    def _expand_template(self, template, node, depth, fragments):
+        # the template interpreter: the fragments go to a Fragments sink,
+        # which joins them or writes them as they're ready
+        template = self._select_template(template, node)
         normal_depth = depth
         after_newline = False
-        
+
         for i, element in enumerate(template):
             if isinstance(element, str):
                 if after_newline:
                     if depth:
-                        expanded.append(self.offset(depth))
+                        fragments.append(self.offset(depth))
                     after_newline = False
-                expanded.append(element)
+                fragments.append(element)
             elif isinstance(element, Whitespace):
                 if element.is_offset:
                     depth += element.count
                     if depth:
-                        expanded.append(self.offset(depth))
+                        fragments.append(self.offset(depth))
                     after_newline = False
                 else:
-                    expanded.append(' ')
+                    fragments.append(' ')
             elif isinstance(element, Newline):
-                print(' ',template[i-2] if i >= 2 else '', expanded[-3:])
-                if expanded == ['', '\n'] or expanded == ['']:
-                    expanded = []
-                elif len(expanded) >= 2 and not expanded[-1] and (i >= 2 and isinstance(template[i - 2], Whitespace) and template[i - 2].is_offset) and (not expanded[-2] or expanded[-2][0] == '\n' or expanded[-2][0] == self._symbol):
-                    # unrealised fragment, we should swallow that line
-                    # sorry sov
-                    expanded.pop()
-                    if not expanded[-1] or expanded[-1][0] == self._symbol:
-                        expanded.pop()
-                    print(expanded[-3:])
-                elif expanded:
-                    expanded.append('\n')
-                    print('l ', expanded)
+                # unrealised fragments swallow their line
+                end_line(fragments, self._symbol, i >= 2 and isinstance(template[i - 2], Whitespace) and template[i - 2].is_offset)
                 after_newline = True
                 depth = normal_depth
+            elif hasattr(element, 'expand') or callable(element):
+                fragments.expand(element, node, depth)
 
-            elif hasattr(element, 'expand'):
-                expanded.append(element.expand(self, node, depth))
-            elif callable(element):
-                expanded.append(element(self, node, depth))
-            # print(depth,node.type, expanded)
-        return ''.join(expanded)
-
-    def _parse_template(self, code, label):
+    @classmethod
+    def _parse_template(cls, code, label):
         '''
         Pare smart indented templates
 
@@ -216,10 +481,10 @@ class CodeGenerator:
         '''
 
         if isinstance(code, tuple):
-            return tuple(self._parse_template(c, label) for c in code)
+            return tuple(cls._parse_template(c, label) for c in code)
         elif isinstance(code, dict):
             return {
-                k: self._parse_template(v, label) if k != '_key' else v
+                k: cls._parse_template(v, label) if k != '_key' else v
                 for k, v
                 in code.items()
             }
@@ -400,3 +665,7 @@ class CodeGenerator:
 def switch(key, **cases):
     return dict(_key= key, **cases)
 
+def definition_type(node):
+    '''the type of a definition, for generated_code the type of the node it's generated from'''
+    return node.node.type if node.type == 'generated_code' else node.type
+
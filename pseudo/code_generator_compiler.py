@@ -0,0 +1,200 @@
+# compiles parsed templates to python functions
+import keyword
+from pseudo.pseudo_tree import Node
+from pseudo.code_generator_dsl import Placeholder, SubTemplate, Function, Whitespace, Newline, Iterable, end_line
+
+
+def compile_templates(parsed_templates, label, iterative=False):
+    '''
+    compile parsed templates to render functions
+
+    returns a dict node type => render(generator, node, depth) function
+    each function produces exactly the same output as
+    `CodeGenerator._generate_from_template` for the same template
+    but without dispatching on each template element
+
+    with iterative the render functions are generators: instead of
+    generating the child nodes of the placeholders they yield (child, depth)
+    and expect the generated code back(see CodeGenerator._generate_iterative_node),
+    a %<#name> function is replaced by the generator's name_steps method if it has one
+    '''
+
+    return TemplateCompiler(parsed_templates, label, iterative).compile()
+
+
+def expand_placeholder_list(generator, content, depth):
+    # Placeholder.expand for list fields
+    if not content:
+        return ''
+    expanded = [generator._generate_node(content[0], depth)]
+    expanded += [generator.offset(depth) + generator._generate_node(node, depth) for node in content[1:]]
+    return '\n'.join(expanded) + '\n'
+
+
+def expand_placeholder_list_steps(generator, content, depth):
+    # expand_placeholder_list for iterative render functions
+    if not content:
+        return ''
+    expanded = []
+    for node in content:
+        code = (yield node, depth) if isinstance(node, Node) else node
+        expanded.append(generator.offset(depth) + code if expanded else code)
+    return '\n'.join(expanded) + '\n'
+
+
+def function_steps(generator, name, node, depth):
+    # Function.expand for iterative render functions: a <name>_steps generator method
+    # yields its children like them, other functions are just called
+    steps = getattr(generator, '%s_steps' % name, None)
+    if steps is None:
+        return getattr(generator, name)(node, depth)
+    return (yield from steps(node, depth))
+
+
+class TemplateCompiler:
+    '''
+    generates the source of a module with a render function for each template
+
+    the static state of the interpreter (offsets of the current line,
+    is it after a newline, the elements before a newline) is resolved
+    while compiling, the newlines use the end_line of the interpreter
+    '''
+
+    def __init__(self, parsed_templates, label, iterative=False):
+        self.parsed_templates = parsed_templates
+        self.label = label
+        self.iterative = iterative
+        self.namespace = {
+            'Node': Node,
+            'Iterable': Iterable,
+            '_expand_list': expand_placeholder_list_steps if iterative else expand_placeholder_list,
+            '_function': function_steps,
+            '_end_line': end_line
+        }
+        self.lines = []
+        self.count = 0
+        self.compiled = {} # id(template) => function name
+        self.switches = [] # (cases constant, variant function names)
+
+    def compile(self):
+        names = {}
+        for node_type, template in self.parsed_templates.items():
+            names[node_type] = self.compile_template(template)
+        source = '\n'.join(self.lines) + '\n'
+        exec(compile(source, '<pseudo templates %s>' % self.label, 'exec'), self.namespace)
+        for cases, variants in self.switches:
+            self.namespace[cases].update({k: self.namespace[v] for k, v in variants.items()})
+        # tuples are layout/default pairs only used by sub templates
+        return {node_type: self.namespace[name] for node_type, name in names.items() if not isinstance(name, tuple)}
+
+    def constant(self, value):
+        name = '_c%d' % self.count
+        self.count += 1
+        self.namespace[name] = value
+        return name
+
+    def function_name(self):
+        name = '_render%d' % self.count
+        self.count += 1
+        return name
+
+    def compile_template(self, template):
+        if isinstance(template, tuple):
+            return tuple(self.compile_template(t) for t in template)
+        elif id(template) not in self.compiled:
+            if isinstance(template, dict):
+                self.compiled[id(template)] = self.compile_switch(template)
+            else:
+                self.compiled[id(template)] = self.compile_list(template)
+        return self.compiled[id(template)]
+
+    def compile_switch(self, template):
+        variants = {k: self.compile_template(v) for k, v in template.items() if k != '_key'}
+        cases = self.constant({})
+        self.switches.append((cases, variants))
+        name = self.function_name()
+        self.lines.append('def %s(self, node, depth):' % name)
+        if isinstance(template['_key'], str):
+            self.lines.append('    t = %s.get(str(%s).lower())' % (cases, self.field(template['_key'])))
+        else:
+            self.lines.append('    t = %s.get(str(%s(node)).lower())' % (cases, self.constant(template['_key'])))
+        self.lines.append('    if t is None:')
+        self.lines.append('        t = %s[%r]' % (cases, '_otherwise'))
+        if self.iterative:
+            self.lines.append('    return (yield from t(self, node, depth))')
+        else:
+            self.lines.append('    return t(self, node, depth)')
+        return name
+
+    def field(self, name):
+        if name.isidentifier() and not keyword.iskeyword(name):
+            return 'node.%s' % name
+        else:
+            return 'getattr(node, %r)' % name
+
+    def compile_list(self, template):
+        name = self.function_name()
+        body = []
+        offset = 0
+        after_newline = False
+
+        def depth():
+            return 'depth + %d' % offset if offset else 'depth'
+
+        if self.iterative:
+            generate, expand_list, call = '(yield _v, %s)', '(yield from _expand_list(self, _v, %s))', '(yield from %s(self, node, %s))'
+        else:
+            generate, expand_list, call = 'self._generate_node(_v, %s)', '_expand_list(self, _v, %s)', '%s(self, node, %s)'
+
+        for i, element in enumerate(template):
+            if isinstance(element, str):
+                if after_newline:
+                    body.append('if depth:')
+                    body.append('    _a(self.offset(depth))')
+                    after_newline = False
+                body.append('_a(%r)' % element)
+            elif isinstance(element, Whitespace):
+                if element.is_offset:
+                    offset += element.count
+                    if offset:
+                        body.append('_a(self.offset(%s))' % depth())
+                    else:
+                        body.append('if depth:')
+                        body.append('    _a(self.offset(depth))')
+                    after_newline = False
+                else:
+                    body.append("_a(' ')")
+            elif isinstance(element, Newline):
+                body.append('_end_line(_e, self._symbol, %r)' % (i >= 2 and isinstance(template[i - 2], Whitespace) and template[i - 2].is_offset))
+                after_newline = True
+                offset = 0
+            elif isinstance(element, Placeholder):
+                body.append('_v = %s' % self.field(element.field))
+                body.append('if isinstance(_v, Iterable):')
+                body.append('    _a(%s)' % (expand_list % depth()))
+                body.append('elif isinstance(_v, Node):')
+                body.append('    _a(%s)' % (generate % depth()))
+                body.append('else:')
+                body.append('    _a(str(_v))')
+            elif isinstance(element, SubTemplate) and '%s_%s' % (element.a, element.field) in self.parsed_templates:
+                layout, default = self.compile_template(
+                    self.parsed_templates['%s_%s' % (element.a, element.field)])
+                body.append('if not %s:' % self.field(element.field))
+                body.append('    _a(%s)' % (call % (default, depth())))
+                body.append('else:')
+                body.append('    _a(%s)' % (call % (layout, depth())))
+            elif self.iterative and isinstance(element, Function):
+                body.append('_a((yield from _function(self, %r, node, %s)))' % (element.name, depth()))
+            elif hasattr(element, 'expand'):
+                body.append('_a(%s(self, node, %s))' % (self.constant(element.expand), depth()))
+            elif callable(element):
+                body.append('_a(%s(self, node, %s))' % (self.constant(element), depth()))
+
+        self.lines.append('def %s(self, node, depth):' % name)
+        self.lines.append('    _e = []')
+        self.lines.append('    _a = _e.append')
+        self.lines.extend('    %s' % line for line in body)
+        self.lines.append("    return ''.join(_e)")
+        if self.iterative:
+            self.lines.append('    yield # a generator even without placeholders')
+        return name
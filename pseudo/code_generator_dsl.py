@@ -145,6 +145,24 @@ class Newline:
     def y(self):
         return repr(self)
 
+def end_line(fragments, symbol, after_offset):
+    '''
+    the Newline of a template for the fragments expanded before it
+
+    the interpreter and the compiled render functions end their lines with it:
+    a line which expanded only to an offset and an empty fragment is swallowed
+    (after_offset: the element two before the newline is an offset),
+    only the first letter of each fragment is checked
+    '''
+    if fragments == ['', '\n'] or fragments == ['']:
+        del fragments[:]
+    elif after_offset and len(fragments) >= 2 and not fragments[-1] and (not fragments[-2] or fragments[-2][0] == '\n' or fragments[-2][0] == symbol):
+        fragments.pop()
+        if not fragments[-1] or fragments[-1][0] == symbol:
+            fragments.pop()
+    elif fragments:
+        fragments.append('\n')
+
 def internal_whitespace(count):
     return Whitespace(count, False)
 
@@ -0,0 +1,75 @@
+# writing generated code to a stream in chunks
+import io
+from pseudo.errors import PseudoError
+
+# the code after the dependencies is kept in memory up to that size
+SPOOL_SIZE = 4 * 1024 * 1024
+COPY_SIZE = 64 * 1024
+
+
+class ModuleWriter:
+    '''
+    writes the code of a module, the additional code(generator.a)
+    is inserted after the first lines(one for each dependency) on close
+
+    with hoisting the code after the dependencies is kept in memory
+    (in a temporary file after SPOOL_SIZE) until the additional code is ready,
+    otherwise it's written directly
+    '''
+
+    def __init__(self, write, dependencies, hoisting):
+        self._write = write
+        self.dependencies = dependencies
+        self.lines = 0
+        self.in_header = dependencies > 0
+        self.rest = io.StringIO(newline='') if hoisting else None
+        self.spooled = 0
+
+    def write(self, text):
+        if self.in_header:
+            end = 0
+            while self.lines < self.dependencies:
+                end = text.find('\n', end) + 1
+                if not end:
+                    self._write(text)
+                    return
+                self.lines += 1
+            self._write(text[:end - 1])
+            text = text[end:]
+            self.in_header = False
+            if self.rest is None:
+                self._write('\n')
+        if self.rest is None:
+            self._write(text)
+        else:
+            self.rest.write(text)
+            self.spooled += len(text)
+            if self.spooled > SPOOL_SIZE and isinstance(self.rest, io.StringIO):
+                self._roll_over()
+
+    def _roll_over(self):
+        # like SpooledTemporaryFile, but tempfile is imported only for big modules
+        import tempfile
+        spool = tempfile.TemporaryFile('w+', encoding='utf-8', newline='')
+        spool.write(self.rest.getvalue())
+        self.rest = spool
+
+    def close(self, additional):
+        if self.rest is None:
+            if additional:
+                raise PseudoError('the generator adds code to generator.a without hoists_code')
+            return
+        if additional:
+            if self.dependencies:
+                self._write('\n')
+            self._write('\n'.join((['\n'] if self.dependencies else []) + additional + ['\n']))
+            if not self.in_header:
+                self._write('\n')
+        elif not self.in_header and self.dependencies:
+            self._write('\n')
+        self.rest.seek(0)
+        for chunk in iter(lambda: self.rest.read(COPY_SIZE), ''):
+            self._write(chunk)
+        self.rest.close()
+        if additional:
+            self._write('\n')
@@ -8,4 +8,7 @@ class PseudoDSLError(PseudoError):
     pass
 
 class PseudoTypeError(PseudoError):
-	pass
\ No newline at end of file
+	pass
+
+class PseudoBinaryFormatError(PseudoError):
+    pass
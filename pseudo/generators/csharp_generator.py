@@ -1,4 +1,4 @@
-from pseudo.code_generator import CodeGenerator, switch
+from pseudo.code_generator import CodeGenerator, switch, definition_type
 from pseudo.middlewares import DeclarationMiddleware, NameMiddleware
 from pseudo.pseudo_tree import Node, local
 
@@ -267,14 +267,14 @@ class CSharpGenerator(CodeGenerator):
     )
     
     def class_definitions(self, node, depth):
-        result = '\n'.join(self._generate_node(k) for k in node.definitions if k.type == 'class_definition')
+        result = '\n'.join(self._generate_node(k) for k in node.definitions if definition_type(k) == 'class_definition')
         if result:
             return result + '\n'
         else:
             return ''
 
     def function_definitions(self, node, depth):
-        result = '\n'.join(self._generate_node(f, 1) for f in node.definitions if f.type == 'function_definition')
+        result = '\n'.join(self._generate_node(f, 1) for f in node.definitions if definition_type(f) == 'function_definition')
         if result:
             return result + '\n'        
         else:
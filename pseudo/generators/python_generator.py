@@ -26,6 +26,7 @@ class PythonGenerator(CodeGenerator):
     indent = 4
     use_spaces = True
     middlewares = []
+    hoists_code = True # multiline lambdas
 
     templates = dict(
         module     = "%<dependencies:lines>%<constants:lines>%<custom_exceptions:lines>%<definitions:lines>%<main:lines>",
@@ -258,9 +259,16 @@ class PythonGenerator(CodeGenerator):
     def binary_right(self, node, indent):
         return self.binary_side(node.right, node.op)
 
+    def binary_left_steps(self, node, indent):
+        return self.parenthesize(node.left, node.op, (yield node.left, 0))
+
+    def binary_right_steps(self, node, indent):
+        return self.parenthesize(node.right, node.op, (yield node.right, 0))
+
     def binary_side(self, field, op):
-        base = self._generate_node(field)
-        print(field.pseudo_type)
+        return self.parenthesize(field, op, self._generate_node(field))
+
+    def parenthesize(self, field, op, base):
         if (field.type == 'binary_op' or field.pseudo_type == 'comparison') and\
            PRIORITIES[field.op] < PRIORITIES[op]:
             return '(%s)' % base
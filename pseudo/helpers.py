@@ -15,3 +15,42 @@ def safe_serialize_type(l):
         return '%s_%s_' % (l[0], ''.join(map(serialize_type, l[1:])))
     else:
         return str(l)
+
+def dispatch_table(cls, prefix, exclude=()):
+    '''
+    node type => function for each <prefix><node type> method of cls(and its bases)
+    except the names in exclude(walkers and api methods with the same prefix)
+
+    call the functions with the instance as the first arg
+    '''
+
+    table = {}
+    for name in dir(cls):
+        if name.startswith(prefix) and name[len(prefix):] not in exclude:
+            function = getattr(cls, name)
+            if callable(function):
+                table[name[len(prefix):]] = function
+    return table
+
+def run_steps(step, *args):
+    '''
+    runs a recursive walk written as step generators with an explicit stack
+
+    step(*args) is a generator which yields a tuple of args for each sub-walk
+    and gets its result back, its return value is the result
+    the depth of the walk doesn't add python frames
+    '''
+
+    stack = [step(*args)]
+    value = None
+    while True:
+        try:
+            request = stack[-1].send(value)
+        except StopIteration as e:
+            stack.pop()
+            if not stack:
+                return e.value
+            value = e.value
+        else:
+            stack.append(step(*request))
+            value = None
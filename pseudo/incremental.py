@@ -0,0 +1,112 @@
+# regenerating a module after small changes
+import io
+import pseudo
+from pseudo.cache import tree_hash
+from pseudo.pseudo_tree import Node, copy_node
+
+
+class _Added(dict):
+    # the names added by the translator of a part in the order of the adds,
+    # they're added again in that order, so the dependencies are the same as
+    # for the whole module(they're sets, their order depends on the adds)
+    def add(self, name):
+        self[name] = None
+
+
+class _Part:
+    # a top-level definition(or main) translated and processed by the middlewares:
+    # generated_code nodes for it and what it adds to the header of the module
+    __slots__ = ('nodes', 'used', 'standard_dependencies', 'tuple_definitions')
+
+
+class IncrementalGenerator:
+    '''
+    generates the same module again and again in a language,
+    translating and generating again only the top-level definitions that changed
+
+    each definition in module.definitions and main are a part: it's translated and
+    processed by the middlewares on its own(in a module with the names of the other
+    functions if NameMiddleware needs them) and remembered with the hash of its source,
+    so an unchanged part isn't translated, processed or generated again
+
+    only the header is done for each version of the module: the constants, the custom
+    exceptions, the dependencies(with the names used by each part), the go tuple structs
+    and the python additional code(the lambdas in self.a are named by their index,
+    so the code of a part is remembered for each index, see generate_generated_code)
+
+    Example:
+        g = IncrementalGenerator('py')
+        g.generate(tree)
+        g.generate(changed_tree) # only the changed functions/classes are generated
+    '''
+
+    def __init__(self, language):
+        self.language = language
+        self.parts = {} # (source hash, function names) => _Part
+        self.reused = self.expanded = 0 # definitions
+
+    def generate(self, tree):
+        translator = pseudo.API_TRANSLATORS[self.language]
+        generator = pseudo.GENERATORS[self.language]()
+        # the renaming middlewares(NameMiddleware) need the names of all the functions
+        if any(getattr(middleware, 'renames', False) for middleware in generator.middlewares):
+            functions = tuple(d.name for d in tree.definitions if d.type == 'function_definition')
+        else:
+            functions = ()
+        stubs = [Node('function_definition', name=name, params=[], block=[],
+                      pseudo_type=['Function', 'Void'], return_type='Void')
+                 for name in functions]
+        previous, self.parts = self.parts, {}
+        self.reused = self.expanded = 0
+        parts = [self._part(translator, generator, stubs, functions, previous, [definition], [])
+                 for definition in tree.definitions]
+        parts.append(self._part(translator, generator, stubs, functions, previous, [], tree.main))
+
+        # the header: the translator walks the module fields in order,
+        # so the names of the parts are added after the names in the header
+        header = copy_node(tree)
+        header.definitions, header.main = [], []
+        header_translator = translator(header)
+        header_translator.standard_dependencies = set()
+        header_translator.used = set()
+        module = header_translator.translate()
+        for part in parts:
+            header_translator.used.update(part.used)
+            header_translator.standard_dependencies.update(part.standard_dependencies)
+        module.dependencies = header_translator.module_dependencies()
+        module.definitions = stubs
+        module = generator.apply_middlewares(module)
+
+        module.definitions = [node for part in parts[:-1] for node in part.nodes]
+        module.main = parts[-1].nodes
+        if hasattr(module, 'tuple_definitions'):
+            tuple_definitions = {definition.name: definition for definition in module.tuple_definitions}
+            for part in parts:
+                for definition in part.tuple_definitions:
+                    tuple_definitions.setdefault(definition.name, definition)
+            module.tuple_definitions = list(tuple_definitions.values())
+        stream = io.StringIO()
+        generator.emit_to(module, stream)
+        return stream.getvalue()
+
+    def _part(self, translator, generator, stubs, functions, previous, definitions, main):
+        unit = Node('module', dependencies=[], constants=[], custom_exceptions=[], definitions=definitions, main=main)
+        key = tree_hash(unit), functions
+        part = previous.get(key) or self.parts.get(key)
+        if part is None:
+            part = _Part()
+            part_translator = translator(unit)
+            part.used = part_translator.used = _Added()
+            part.standard_dependencies = part_translator.standard_dependencies = _Added()
+            translated = part_translator.translate()
+            translated.definitions = translated.definitions + stubs
+            processed = generator.apply_middlewares(translated)
+            nodes = processed.definitions[:len(definitions)] if definitions else processed.main
+            part.nodes = [Node('generated_code', node=node, codes={}) for node in nodes]
+            part.tuple_definitions = getattr(processed, 'tuple_definitions', [])
+            if definitions:
+                self.expanded += 1
+        elif definitions:
+            self.reused += 1
+        self.parts[key] = part
+        return part
@@ -1,5 +1,11 @@
+import importlib
+import os
+import shutil
 import types
 import yaml
+import pseudo.binary_format
+from pseudo.errors import PseudoError
+from pseudo.helpers import run_steps
 from pseudo.pseudo_tree import Node
 
 
@@ -14,31 +20,299 @@ COMMANDS = {
 }
 
 
+# front ends which can be called in process:
+# extension => package with a translate(source) function or the function itself
+# translate can return a tree, a dict or yaml intermediate code
+FRONT_ENDS = {
+    'py': 'pseudo_python',
+    'rb': 'pseudo_ruby',
+    'js': 'pseudo_javascript',
+    'swift': 'pseudo_swift',
+    'java': 'pseudo_java',
+    'cs': 'pseudo_csharp',
+    'go': 'pseudo_golang'
+}
+
+_front_ends = {} # extension => translate function or None if not importable
+
+
+def register_front_end(extension, front_end):
+    '''use front_end(a package name or a translate function) for extension files'''
+
+    FRONT_ENDS[extension] = front_end
+    _front_ends.pop(extension, None)
+
+
+def front_end(extension):
+    '''the in-process translate function for extension or None'''
+
+    if extension not in _front_ends:
+        translate = FRONT_ENDS.get(extension)
+        if isinstance(translate, str):
+            try:
+                translate = getattr(importlib.import_module(translate), 'translate', None)
+            except ImportError:
+                translate = None
+        _front_ends[extension] = translate
+    return _front_ends[extension]
+
+
 def load_input(filename, call_command):
+    '''
+    the intermediate code for a file
+
+    str for .pseudo.yaml, bytes for .pseudo.bin
+    source files are translated by their front end: in process if it's importable
+    (the result can be directly a tree) or with its command(call_command(args)) otherwise
+    '''
+
     base, _, extension = filename.rpartition('.')
+    if extension == 'bin':
+        with open(filename, 'rb') as f:
+            return f.read()
     with open(filename) as f:
         source = f.read()
     if extension == 'yaml':
-        intermediate_code = source
+        return source
+    translate = front_end(extension)
+    if translate:
+        return translate(source)
+    elif extension in COMMANDS:
+        return run_front_end(filename, source, call_command)
+    else:
+        raise PseudoError('no front end for .%s files' % extension)
+
+
+def run_front_end(filename, source, call_command):
+    '''
+    call the front end command for a copy of filename in a temp directory
+
+    the front ends write <base>.pseudo.yaml next to their input,
+    so the source file's directory isn't touched
+    '''
+
+    input_filename, output_filename = _front_end_files(filename, source)
+    try:
+        call_command(COMMANDS[filename.rpartition('.')[2]](input_filename))
+        with open(output_filename) as f:
+            return f.read()
+    finally:
+        _remove_front_end_files(input_filename, output_filename)
+
+
+async def aload_input(filename, executor=None):
+    '''
+    load_input as a coroutine for asyncio code
+
+    the files are read and in-process front ends run in executor(the default executor
+    of the loop if None) and front end commands run as asyncio subprocesses,
+    so the event loop isn't blocked
+    '''
+
+    import asyncio
+    loop = asyncio.get_running_loop()
+    extension = filename.rpartition('.')[2]
+    if extension == 'bin':
+        return await loop.run_in_executor(executor, _read, filename, 'rb')
+    source = await loop.run_in_executor(executor, _read, filename, 'r')
+    if extension == 'yaml':
+        return source
+    translate = front_end(extension)
+    if translate:
+        return await loop.run_in_executor(executor, translate, source)
+    elif extension in COMMANDS:
+        return await arun_front_end(filename, source)
     else:
-        call_command(COMMANDS[extension](filename))
-        with open('%s.pseudo.yaml' % base, 'r') as f:
-            intermediate_code = f.read()
-        call_command(['rm', '%s.pseudo.yaml' % base])
-    return intermediate_code
+        raise PseudoError('no front end for .%s files' % extension)
+
+
+async def arun_front_end(filename, source):
+    '''run_front_end with the command as an asyncio subprocess'''
+
+    import asyncio
+    # the temp files are small, only the command is worth awaiting
+    input_filename, output_filename = _front_end_files(filename, source)
+    try:
+        args = COMMANDS[filename.rpartition('.')[2]](input_filename)
+        process = await asyncio.create_subprocess_exec(*args)
+        if await process.wait():
+            raise PseudoError('%s failed with exit status %d' % (args[0], process.returncode))
+        with open(output_filename) as f:
+            return f.read()
+    finally:
+        _remove_front_end_files(input_filename, output_filename)
+
+
+def _read(filename, mode):
+    with open(filename, mode) as f:
+        return f.read()
+
+
+def _front_end_files(filename, source):
+    # a copy of the source in a temp directory and the output of the front end for it
+    import tempfile # only for the front ends, it's slow to import
+
+    directory = tempfile.mkdtemp(prefix='pseudo')
+    input_filename = os.path.join(directory, os.path.basename(filename))
+    output_filename = '%s.pseudo.yaml' % input_filename.rpartition('.')[0]
+    try:
+        with open(input_filename, 'w') as f:
+            f.write(source)
+    except BaseException: # the directory is removed and the error is raised again
+        _remove_front_end_files(input_filename, output_filename)
+        raise
+    return input_filename, output_filename
+
+
+def _remove_front_end_files(input_filename, output_filename):
+    # the front end can leave other files(a cache, a log) in the directory
+    shutil.rmtree(os.path.dirname(input_filename), ignore_errors=True)
 
 
 def as_tree(intermediate_code):
-    intermediate_code = yaml.load(intermediate_code)
-    return convert_to_syntax_tree(intermediate_code)
+    '''
+    a tree from yaml intermediate code(str) or from the binary format(bytes)
+
+    trees and dicts from in-process front ends are accepted too
+    '''
+
+    if isinstance(intermediate_code, Node):
+        return intermediate_code
+    elif isinstance(intermediate_code, dict):
+        return convert_to_syntax_tree(intermediate_code)
+    elif isinstance(intermediate_code, bytes):
+        return pseudo.binary_format.loads(intermediate_code)
+    return yaml.load(intermediate_code, Loader=TreeLoader)
+
+
+def as_yaml(tree):
+    '''the yaml intermediate code for a tree'''
+
+    return yaml.dump(tree, Dumper=TreeDumper, default_flow_style=False, sort_keys=False)
+
+
+def as_binary(tree):
+    '''the binary intermediate code for a tree'''
+
+    return pseudo.binary_format.dumps(tree)
+
+
+# the libyaml loader/dumper if pyyaml is built with it
+BaseLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+BaseDumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
+
+class TreeLoader(BaseLoader):
+    '''
+    loads pseudo yaml directly as a tree
+
+    mappings with a type field are built as nodes while loading,
+    so we don't walk the loaded data again like `convert_to_syntax_tree`
+
+    the children are constructed like yaml's own maps and sequences: an empty
+    node is returned first and filled later by the loop in construct_document,
+    so deep trees don't hit the recursion limit
+    '''
+
+    def construct_tree_mapping(self, node):
+        node_type = None
+        for key_node, value_node in node.value:
+            if isinstance(key_node, yaml.ScalarNode) and key_node.value == 'type':
+                node_type = self.construct_object(value_node)
+        if node_type is None:
+            data = {}
+            yield data
+            data.update(self.construct_mapping(node))
+        else:
+            tree = Node(node_type)
+            yield tree
+            for field, value in self.construct_mapping(node).items():
+                setattr(tree, field, value)
+
+TreeLoader.add_constructor('tag:yaml.org,2002:map', TreeLoader.construct_tree_mapping)
+
+
+class TreeDumper(BaseDumper):
+    '''
+    dumps nodes as mappings with their fields, the reverse of TreeLoader
+
+    nodes, lists and dicts are represented with run_steps,
+    so deep trees don't hit the recursion limit
+    '''
+
+    def represent(self, data):
+        node = run_steps(self._represent_step, data)
+        self.serialize(node)
+        self.represented_objects = {}
+        self.object_keeper = []
+        self.alias_key = None
+
+    def _represent_step(self, data):
+        if isinstance(data, Node):
+            items, tag = data.fields(), 'tag:yaml.org,2002:map'
+        elif isinstance(data, dict):
+            items, tag = list(data.items()), 'tag:yaml.org,2002:map'
+        elif isinstance(data, list):
+            items, tag = data, 'tag:yaml.org,2002:seq'
+        else:
+            return self.represent_data(data)
+
+        # the aliases of represent_data
+        alias_key = None if self.ignore_aliases(data) else id(data)
+        if alias_key is not None:
+            if alias_key in self.represented_objects:
+                return self.represented_objects[alias_key]
+            self.object_keeper.append(data)
+
+        if isinstance(data, list):
+            yaml_node = yaml.SequenceNode(tag, [], flow_style=self.default_flow_style)
+            if alias_key is not None:
+                self.represented_objects[alias_key] = yaml_node
+            for item in items:
+                yaml_node.value.append((yield item,))
+            values = yaml_node.value
+        else:
+            yaml_node = yaml.MappingNode(tag, [], flow_style=self.default_flow_style)
+            if alias_key is not None:
+                self.represented_objects[alias_key] = yaml_node
+            for key, value in items:
+                yaml_node.value.append((self.represent_data(key), (yield value,)))
+            values = [value for pair in yaml_node.value for value in pair]
+        if self.default_flow_style is None:
+            yaml_node.flow_style = all(isinstance(value, yaml.ScalarNode) and not value.style for value in values)
+        return yaml_node
+
+    def represent_node(self, node):
+        return self.represent_mapping('tag:yaml.org,2002:map', node.fields())
+
+TreeDumper.add_multi_representer(Node, TreeDumper.represent_node)
 
 
 def convert_to_syntax_tree(tree):
+    '''
+    nodes for the dicts with a type in a tree of dicts and lists
+
+    walks with an explicit stack, so deep trees don't hit the recursion limit
+    '''
+    return run_steps(_convert_step, tree)
+
+
+def _convert_step(tree):
     if isinstance(tree, dict) and 'type' in tree:
-        return Node(tree['type'], **{k: convert_to_syntax_tree(v) for k, v in tree.items() if k != 'type'})
+        fields = {}
+        for k, v in tree.items():
+            if k != 'type':
+                fields[k] = (yield v,) if isinstance(v, (dict, list)) else v
+        return Node(tree['type'], **fields)
     elif isinstance(tree, dict):
-        return {k: convert_to_syntax_tree(v) for k, v in tree.items()}
+        result = {}
+        for k, v in tree.items():
+            result[k] = (yield v,) if isinstance(v, (dict, list)) else v
+        return result
     elif isinstance(tree, list):
-        return [convert_to_syntax_tree(v) for v in tree]
+        result = []
+        for v in tree:
+            result.append((yield v,) if isinstance(v, (dict, list)) else v)
+        return result
     else:
         return tree
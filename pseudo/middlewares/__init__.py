@@ -4,4 +4,5 @@ from pseudo.middlewares.tuple_middleware import TupleMiddleware
 from pseudo.middlewares.name_middleware import NameMiddleware
 from pseudo.middlewares.cpp_pointer_middleware import CppPointerMiddleware
 from pseudo.middlewares.cpp_display_exception_middleware import CppDisplayExceptionMiddleware
+from pseudo.middlewares.fused_middleware import FusedMiddleware
 #	go_error_handling_middleware import GoErrorHandlingMiddleware
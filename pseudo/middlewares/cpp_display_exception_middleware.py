@@ -6,9 +6,8 @@ class CppDisplayExceptionMiddleware(Middleware):
     converts `cout << e` to a `cout << e.what()` node
     '''
 
-    @classmethod
-    def process(cls, tree):
-        return cls(tree).transform(tree)
+    fusable = True
+    prune = True
 
     def __init__(self, tree):
         self.tree = tree
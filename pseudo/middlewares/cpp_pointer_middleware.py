@@ -10,9 +10,7 @@ class CppPointerMiddleware(Middleware):
     if a variable is allocated with `new`, it's type T is transformed to Pointer[T] and the method calls on it are transformed to pointer_method_calls
     '''
 
-    @classmethod
-    def process(cls, tree):
-        return cls(tree).transform(tree)
+    fusable = True
 
     def __init__(self, tree):
         self.tree = tree
@@ -7,9 +7,12 @@ class DeclarationMiddleware(Middleware):
     adds a boolean first_mention field to assignments for first mentions of locals as targets of
     assignments
     adds a local_declarations array with local not-arg names to function/methods
-    rebuilds tree TreeTransformer in place!!
+    rebuilds only the changed nodes, TreeTransformer copies them
     '''
 
+    # transform_function and transform_methods are aliases of transform_f, no nodes have these types
+    not_handlers = Middleware.not_handlers | {'f', 'function', 'methods'}
+
     @classmethod
     def process(cls, tree):
         return cls(tree).transform(tree)
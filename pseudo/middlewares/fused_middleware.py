@@ -0,0 +1,105 @@
+from pseudo.pseudo_tree import Node, copy_node
+from pseudo.tree_transformer import TreeTransformer, SCOPE_TYPES
+
+FUNCTION_TYPES = {'function_definition', 'anonymous_function', 'constructor', 'method_definition'}
+
+
+class FusedMiddleware(TreeTransformer):
+    '''
+    applies several fusable middlewares in one walk instead of a walk for each
+
+    a node which none of the middlewares handles is copied only if one of its children
+    changes(see TreeTransformer), other nodes are copied once, their children are walked for the middlewares
+    without a transform_<type> handler for it(like their transform_default would do),
+    then the handler and the after hook of each middleware are applied in order
+    subtrees are skipped if all the middlewares prune them
+
+    the result is the same as applying them one after another
+    if they are fusable(see Middleware)
+
+    the walk is a _visit step generator like TreeTransformer's, so it can be iterative too
+    '''
+
+    def __init__(self, middlewares):
+        self.middlewares = middlewares
+        self.__name__ = '+'.join(m.__name__ for m in middlewares)
+
+    @classmethod
+    def passes(cls, middlewares):
+        '''middlewares with each run of consecutive fusable middlewares fused'''
+
+        result, run = [], []
+        for middleware in list(middlewares) + [None]:
+            if middleware is not None and getattr(middleware, 'fusable', False):
+                run.append(middleware)
+                continue
+            if len(run) > 1:
+                result.append(cls(run))
+            else:
+                result.extend(run)
+            run = []
+            if middleware is not None:
+                result.append(middleware)
+        return result
+
+    def process(self, tree):
+        # the walk skips the subtrees all the middlewares prune, see pruned
+        self.prune, self._prune_hits, self._prune_misses = True, 0, 0
+        self.active = []
+        for middleware in self.middlewares:
+            tree, instance = middleware.prepare(tree)
+            self.active.append(instance)
+        tree = self.transform(tree)
+        for instance in self.active:
+            tree = instance.finish(tree)
+        return tree
+
+    def _visit(self, tree, in_block=False, assignment=None):
+        # the step of transform and iterative_transform(see TreeTransformer)
+        if isinstance(tree, list):
+            result = []
+            for child in tree:
+                result.append((yield child, False, None))
+            return result
+        elif not isinstance(tree, Node):
+            return tree
+
+        active = self.active
+        if self.prune:
+            mask = 0
+            for m in active:
+                if not m.prune:
+                    break
+                mask |= m.handled_mask
+            else:
+                if self.pruned(tree, mask):
+                    return tree
+        if tree.type not in SCOPE_TYPES and not any(tree.type in m._handlers or m.after for m in active):
+            return (yield from self._visit_shared(tree))
+        original = tree
+        tree = copied = copy_node(tree)
+        old = [(m.current_class, m.current_function) for m in active]
+        for m in active:
+            if tree.type == 'class_definition' or tree.type == 'module':
+                m.current_class = tree
+            elif tree.type in FUNCTION_TYPES:
+                m.current_function = tree
+
+        walking = [m for m in active if tree.type not in m._handlers]
+        if walking:
+            self.active = walking
+            tree = yield from self._visit_fields(tree)
+            self.active = active
+
+        for m in active:
+            if not isinstance(tree, Node):
+                break
+            handler = m._handlers.get(tree.type)
+            if handler:
+                tree = handler(m, tree, in_block, assignment)
+            if m.after:
+                tree = m.after(tree, in_block, assignment)
+
+        for m, (current_class, current_function) in zip(active, old):
+            m.current_class, m.current_function = current_class, current_function
+        return self._collapse_copy(tree, copied, original)
@@ -19,12 +19,14 @@ class GoConstructorMiddleware(Middleware):
         other
     '''
 
+    fusable = True
+    prune = True
+
     @classmethod
-    def process(cls, tree):
+    def prepare(cls, tree):
         s = ConstructorTransformer()
         tree = s.transform(tree)
-        result = cls(tree, s.classes_with_simple_initializers).transform(tree)
-        return result
+        return tree, cls(tree, s.classes_with_simple_initializers)
 
     def __init__(self, tree, classes_with_simple_initializers):
         self.current_class, self.current_function = None, None
@@ -33,6 +33,9 @@ class GoErrorHandlingMiddleware(Middleware):
     ok so it seems it can be done and yepp
     '''
 
+    # transform_function and transform_methods are aliases of transform_f, no nodes have these types
+    not_handlers = Middleware.not_handlers | {'f', 'function', 'methods'}
+
     @classmethod
     def process(cls, tree):
         result = cls(tree).transform(tree)
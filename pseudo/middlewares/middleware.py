@@ -1,4 +1,32 @@
 from pseudo.tree_transformer import TreeTransformer
 
 class Middleware(TreeTransformer):
-	pass
+    '''
+    a tree pass applied by a generator before expanding the templates
+
+    fusable middlewares can share one walk with their neighbours(see FusedMiddleware):
+    their transform_<type> handlers and after hooks change only the node they get
+    (they don't transform its children) and return a node,
+    and they don't depend on the changes of the previous fusable middlewares
+    outside of the current subtree
+
+    middlewares with renames take a names dict in process(tree, names)
+    and fill it with generated name => source name(see NameMiddleware)
+    '''
+
+    fusable = False
+    renames = False
+
+    @classmethod
+    def process(cls, tree):
+        tree, middleware = cls.prepare(tree)
+        return middleware.finish(middleware.transform(tree))
+
+    @classmethod
+    def prepare(cls, tree):
+        '''(tree, middleware instance) before the walk'''
+        return tree, cls(tree)
+
+    def finish(self, tree):
+        '''the final tree after the walk'''
+        return tree
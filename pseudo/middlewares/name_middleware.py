@@ -1,5 +1,11 @@
+import functools
+from pseudo.errors import PseudoError
 from pseudo.middlewares.middleware import Middleware
 
+# the size of the process-wide cache of converted names
+NAME_CACHE_SIZE = 4096
+
+
 class NameMiddleware(Middleware):
     '''
     changes names according to language conventions
@@ -8,76 +14,139 @@ class NameMiddleware(Middleware):
     available rules: snake_case, camel_case, pascal_case
 
     currently used c#, go, javascript and php
+
+    an instance is shared by all the runs of a generator class,
+    so each run(process) uses its own copy with the state of the tree
+
+    each name is converted once per run, with shared_cache the conversions
+    are cached for the process too(bounded, see convert_name): it's off for
+    the subclasses which override the convert_to_<rule> methods or words
+    process(tree, names) fills names with generated name => source name
+    for each changed name(the first source name if several get the same name)
     '''
 
+    renames = True
+    not_handlers = Middleware.not_handlers | {'normal_name', 'f'}
+    shared_cache = True
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if any(getattr(cls, name) is not getattr(NameMiddleware, name) for name in CONVERTERS):
+            cls.shared_cache = False
+
     def __init__(self, normal_name=None, method_name=None, function_name=None):
         self.normal_name = normal_name
         self.method_name = method_name
         self.function_name = function_name
-        
-    def process(self, tree):
-        self.tree = tree
-        self.defined_functions = {q.name for q in self.tree.definitions if q.type == 'function_definition'}
-        return self.transform(tree)
+
+    def process(self, tree, names=None):
+        tree, middleware = self.prepare(tree)
+        middleware.names = names
+        return middleware.finish(middleware.transform(tree))
+
+    def prepare(self, tree):
+        middleware = type(self)(self.normal_name, self.method_name, self.function_name)
+        middleware.shared_cache = self.shared_cache
+        middleware.tree = tree
+        middleware.defined_functions = {q.name for q in tree.definitions if q.type == 'function_definition'}
+        middleware.converted = {} # (rule, name) => new name
+        middleware.names = None
+        return tree, middleware
+
+    def rename(self, rule, name):
+        '''name converted with rule, once per run'''
+
+        new_name = self.converted.get((rule, name))
+        if new_name is None:
+            if self.shared_cache:
+                new_name = convert_name(rule, name)
+            else:
+                new_name = getattr(self, 'convert_to_%s' % rule)(name)
+            self.converted[rule, name] = new_name
+            if self.names is not None and new_name != name:
+                self.names.setdefault(new_name, name)
+        return new_name
 
     def transform_normal_name(self, node, in_block=False, assignment=None):
         if isinstance(node.name, str):
-            # import pdb; pdb.set_trace()
             if node.type == 'local' and node.name in self.defined_functions:
                 if self.function_name:
-                    node.name = getattr(self, 'convert_to_%s' % self.function_name)(node.name)
+                    node.name = self.rename(self.function_name, node.name)
             else:
                 if self.normal_name:
-                    node.name = getattr(self, 'convert_to_%s' % self.normal_name)(node.name)
-        elif self.normal_name:
-            print('NORM', node.name.y)
-            # input()
+                    node.name = self.rename(self.normal_name, node.name)
         return node
-    
+
     transform_local = transform_instance_variable = transform_normal_name
 
     def transform_f(self, node, in_block=False, assignment=None):
         if node.type == 'function_definition' and self.function_name:
-            node.name = getattr(self, 'convert_to_%s' % self.function_name)(node.name)
+            node.name = self.rename(self.function_name, node.name)
         elif node.type == 'method_definition' and self.method_name:
-            node.name = getattr(self, 'convert_to_%s' % self.method_name)(node.name)
+            node.name = self.rename(self.method_name, node.name)
         if self.normal_name:
-            new_name = getattr(self, 'convert_to_%s' % self.normal_name)
-            node.params = [new_name(param.name) for param in node.params]
+            node.params = [self.rename(self.normal_name, param.name) for param in node.params]
 
         node.block = self.transform(node.block)
-        
+
         return node
 
     transform_function_definition = transform_method_definition = transfrom_anonymous_function = transform_f
 
     def transform_method_call(self, node, in_block=False, assignment=None):
         if self.method_name:
-            node.message = getattr(self, 'convert_to_%s' % self.method_name)(node.message)
+            node.message = self.rename(self.method_name, node.message)
         node.receiver = self.transform(node.receiver)
         node.args = self.transform(node.args)
         return node
 
     def convert_to_pascal_case(self, name):
-        return ''.join(q.title() for q in self.words(name))
+        return pascal_case(name)
 
     def convert_to_camel_case(self, name):
-        words = self.words(name)
-        return words[0] + ''.join(q.title() for q in words[1:])
+        return camel_case(name)
 
     def convert_to_snake_case(self, name):
-        return '_'.join(self.words(name))
+        return snake_case(name)
 
     def words(self, name):
-        if not isinstance(name, str):
-            import pdb;pdb.set_trace()
-        if '_' in name:
-            return [n.lower() for n in name.split('_')]
-        else:
-            words = [name[0]]
-            for c in name[1:]:
-                if c.isupper():
-                    words.append(c.lower())
-                else:
-                    words[-1] += c
-            return words
+        return words(name)
+
+
+def words(name):
+    if not isinstance(name, str):
+        raise PseudoError('%r is not a name' % (name,))
+    if '_' in name:
+        return [n.lower() for n in name.split('_')]
+    else:
+        words = [name[0]]
+        for c in name[1:]:
+            if c.isupper():
+                words.append(c.lower())
+            else:
+                words[-1] += c
+        return words
+
+
+def pascal_case(name):
+    return ''.join(q.title() for q in words(name))
+
+
+def camel_case(name):
+    ws = words(name)
+    return ws[0] + ''.join(q.title() for q in ws[1:])
+
+
+def snake_case(name):
+    return '_'.join(words(name))
+
+
+CONVERTERS = ('convert_to_pascal_case', 'convert_to_camel_case', 'convert_to_snake_case', 'words')
+
+CONVERSIONS = {'pascal_case': pascal_case, 'camel_case': camel_case, 'snake_case': snake_case}
+
+
+@functools.lru_cache(maxsize=NAME_CACHE_SIZE)
+def convert_name(rule, name):
+    '''name converted with a rule from CONVERSIONS, the last NAME_CACHE_SIZE names are cached'''
+    return CONVERSIONS[rule](name)
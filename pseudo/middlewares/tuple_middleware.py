@@ -1,5 +1,5 @@
 from pseudo.middlewares.middleware import Middleware
-from pseudo.pseudo_tree import Node, assignment
+from pseudo.pseudo_tree import Node, assignment, copy_node
 from pseudo.tree_transformer import TreeTransformer
 from pseudo.helpers import safe_serialize_type
 
@@ -23,16 +23,15 @@ class TupleMiddleware(Middleware):
         other
     '''
 
-    @classmethod
-    def process(cls, tree):
-        return cls(tree).transform_and_create()
+    fusable = True
+    prune = True
 
     def __init__(self, tree):
         self.tree = tree
         self.tuple_definitions = {}
 
-    def transform_and_create(self):
-        self.tree = self.transform(self.tree)
+    def finish(self, tree):
+        self.tree = copy_node(tree)
         self.tree.tuple_definitions = []
         for t, types in self.tuple_definitions.items():
             self.tree.tuple_definitions.append(
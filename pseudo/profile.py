@@ -0,0 +1,79 @@
+# wall time, nodes and allocations for each stage of a translation
+import collections
+import time
+import tracemalloc
+from pseudo.pseudo_tree import Node, count_nodes
+
+# language is None for stages before the api translation(like parse)
+# nodes is the size of the input tree of the stage(or its output for parse)
+# allocated and peak are in bytes, None without memory
+Stage = collections.namedtuple('Stage', ['language', 'name', 'seconds', 'nodes', 'allocated', 'peak'])
+
+
+class Profile:
+    '''
+    collects a Stage for each stage of a translation:
+    parse, api_translate, each middleware pass and emit
+
+    pass it as profile to pseudo.generate, pseudo.generate_many or a CodeGenerator,
+    fused middlewares are a single pass named after all of them
+    with memory=True the allocations of each stage are traced with tracemalloc(slower)
+    nothing is measured without a profile
+
+    Example:
+        profile = Profile()
+        pseudo.generate(tree, 'py', profile=profile)
+        print(profile.report())
+    '''
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.stages = []
+        self.language = None # the language of the next stages
+
+    def run(self, name, function, *args):
+        '''function(*args) as a stage, the first arg is its input tree'''
+
+        nodes = count_nodes(args[0]) if args and isinstance(args[0], Node) else 0
+        tracing = self.memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        if self.memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            result = function(*args)
+        finally:
+            seconds = time.perf_counter() - start
+            allocated = peak = None
+            if self.memory:
+                current, peak = tracemalloc.get_traced_memory()
+                allocated, peak = current - before, peak - before
+            if tracing:
+                tracemalloc.stop()
+        if not nodes and isinstance(result, Node):
+            nodes = count_nodes(result)
+        self.stages.append(Stage(self.language, name, seconds, nodes, allocated, peak))
+        return result
+
+    @property
+    def seconds(self):
+        return sum(stage.seconds for stage in self.stages)
+
+    def report(self):
+        '''a table with a line for each stage'''
+
+        width = max([len(stage.name) for stage in self.stages] + [5])
+        lines = ['%-8s %-*s %10s %8s %12s %10s %10s' % ('language', width, 'stage', 'ms', 'nodes', 'nodes/s', 'alloc KB', 'peak KB')]
+        for stage in self.stages:
+            lines.append('%-8s %-*s %10.2f %8d %12s %10s %10s' % (
+                stage.language or '', width, stage.name, stage.seconds * 1000, stage.nodes,
+                '%.0f' % (stage.nodes / stage.seconds) if stage.seconds else '',
+                _kb(stage.allocated), _kb(stage.peak)))
+        lines.append('%-8s %-*s %10.2f' % ('', width, 'total', self.seconds * 1000))
+        return '\n'.join(lines)
+
+
+def _kb(size):
+    return '' if size is None else '%.1f' % (size / 1024)
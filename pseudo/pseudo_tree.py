@@ -1,23 +1,214 @@
+import threading
 import yaml
+from pseudo.helpers import run_steps
+
+# the fields of each node type: the nodes from docs/ast.md and the ones produced
+# by the translators and the middlewares
+# each type gets a compact class with slots for its fields (and type, pseudo_type),
+# fields not listed here still work, they're just stored in __dict__
+NODE_FIELDS = {
+    'module':                   ('dependencies', 'constants', 'custom_exceptions', 'definitions',
+                                 'main', 'tuple_definitions', 'local_declarations', 'code'),
+    'int':                      ('value',),
+    'float':                    ('value',),
+    'string':                   ('value',),
+    'boolean':                  ('value',),
+    'regex':                    ('value',),
+    'null':                     (),
+    'none':                     (),
+    'this':                     (),
+    'list':                     ('elements',),
+    'set':                      ('elements',),
+    'tuple':                    ('elements',),
+    'array':                    ('elements',),
+    'dictionary':               ('pairs',),
+    'pair':                     ('key', 'value'),
+    'local':                    ('name',),
+    'typename':                 ('name',),
+    'instance_variable':        ('name',),
+    'attr':                     ('object', 'attr'),
+    'index':                    ('sequence', 'index'),
+    'assignment':               ('target', 'value', 'first_mention'),
+    'instance_assignment':      ('name', 'value'),
+    'attr_assignment':          ('attribute', 'value'),
+    'call':                     ('function', 'args'),
+    'method_call':              ('receiver', 'message', 'args'),
+    'pointer_method_call':      ('receiver', 'message', 'args'),
+    'static_call':              ('receiver', 'message', 'args'),
+    'standard_call':            ('namespace', 'function', 'args'),
+    'standard_method_call':     ('receiver', 'message', 'args'),
+    'new_instance':             ('class_name', 'args'),
+    'binary_op':                ('op', 'left', 'right'),
+    'unary_op':                 ('op', 'value'),
+    'comparison':               ('op', 'left', 'right'),
+    'implicit_return':          ('value',),
+    'function_definition':      ('name', 'params', 'return_type', 'block', 'local_declarations'),
+    'method_definition':        ('name', 'params', 'this', 'return_type', 'is_public', 'block',
+                                 'local_declarations'),
+    'constructor':              ('params', 'this', 'return_type', 'block', 'local_declarations'),
+    'anonymous_function':       ('params', 'return_type', 'block', 'local_declarations'),
+    'class_definition':         ('name', 'base', 'constructor', 'attrs', 'methods'),
+    'class_attr':               ('name', 'is_public'),
+    'custom_exception':         ('name', 'base'),
+    'dependency':               ('name',),
+    'if_statement':             ('test', 'block', 'otherwise'),
+    'elseif_statement':         ('test', 'block', 'otherwise'),
+    'else_statement':           ('block',),
+    'while_statement':          ('test', 'block'),
+    'for_statement':            ('iterators', 'sequences', 'block'),
+    'for_range_statement':      ('index', 'first', 'last', 'step', 'block'),
+    'for_iterator':             ('iterator',),
+    'for_iterator_with_index':  ('index', 'iterator'),
+    'for_iterator_with_items':  ('key', 'value'),
+    'for_iterator_zip':         ('iterators',),
+    'for_sequence':             ('sequence',),
+    'for_sequence_with_index':  ('sequence',),
+    'for_sequence_with_items':  ('sequence',),
+    'for_sequence_zip':         ('sequences',),
+    'try_statement':            ('block', 'handlers'),
+    'exception_handler':        ('exception', 'is_builtin', 'instance', 'block'),
+    'throw_statement':          ('exception', 'value')
+}
+
+NODE_CLASSES = {}
+
+# node type => bit in the subtree masks, see subtree_mask
+TYPE_BITS = {}
+_type_bits_lock = threading.Lock() # translations can run on several threads
+
 
 class Node:
     '''
     A pseudo tree node
 
     Example: Node('local', name='l')
+
+    Node(type, ..) creates an instance of the compact class for this type,
+    iterate the fields with `fields()`, not with `__dict__`
     '''
 
-    def __init__(self, type, **fields):
+    __slots__ = ('type', 'pseudo_type', '__dict__')
+    _field_names = ('type', 'pseudo_type')
+
+    # the node is built in __new__, without an __init__ call for each node
+    def __new__(cls, type, **fields):
+        if cls is Node:
+            cls = NODE_CLASSES.get(type, Node)
+        self = object.__new__(cls)
         self.type = type
-        self.__dict__.update(fields)
+        for field, value in fields.items():
+            setattr(self, field, value)
         if 'pseudo_type' not in fields:
             self.pseudo_type = 'Void'
+        return self
+
+    def fields(self):
+        '''a list of (name, value) for each field, type first'''
+        return _fields(self)
+
+    def _copy(self, copy_lists):
+        return _copy(self, copy_lists)
+
+    def __reduce__(self):
+        return Node, (self.type,), dict(self.fields())
+
+    def __setstate__(self, state):
+        for field, value in state.items():
+            setattr(self, field, value)
 
     # and no, __dict__ is not good enough
     @property
     def y(self):
-        result = yaml.dump(self)
-        return result.replace('!python/object:pseudo.pseudo_tree.', '')
+        return yaml.dump(self, Dumper=_NodeDumper)
+
+
+if hasattr(object, '__getstate__'):
+    _state = object.__getstate__ # (__dict__ or None, slots), doesn't create an empty __dict__
+else:
+    def _state(node):
+        slots = {}
+        for name in node._field_names:
+            if hasattr(node, name):
+                slots[name] = getattr(node, name)
+        return node.__dict__, slots
+
+
+def empty_node(node_type):
+    '''a node of node_type without fields(not even type), they're set later'''
+
+    return object.__new__(NODE_CLASSES.get(node_type, Node))
+
+def _fields(node):
+    # the generic fields, for nodes with unset slots
+    extra, slots = _state(node)
+    result = [(name, slots[name]) for name in node._field_names if name in slots]
+    if extra:
+        result.extend(extra.items())
+    return result
+
+def _copy(node, copy_lists):
+    copied = object.__new__(type(node))
+    for field, value in _fields(node):
+        setattr(copied, field, value[:] if copy_lists and isinstance(value, list) else value)
+    return copied
+
+
+# fields and copy are compiled for the fields of each node class: the generic
+# versions above loop over the fields, these read and assign them directly
+# and fall back to the generic versions if a slot isn't set
+_NODE_METHODS = '''
+def fields(self):
+    \'\'\'a list of (name, value) for each field, type first\'\'\'
+    try:
+        _result = [{items}]
+    except AttributeError:
+        return _fields(self)
+    _extra = self.__dict__
+    if _extra:
+        _result.extend(_extra.items())
+    return _result
+
+def copy(self, copy_lists):
+    try:
+        {names}, = {values},
+    except AttributeError:
+        return _copy(self, copy_lists)
+    copied = _new(self.__class__)
+{copy}    _extra = self.__dict__
+    if _extra:
+        for _field, _value in _extra.items():
+            _setattr(copied, _field, _value[:] if copy_lists and _isinstance(_value, _list) else _value)
+    return copied
+'''
+
+def _node_class(node_type, fields):
+    name = ''.join(word.title() for word in node_type.split('_')) + 'Node'
+    field_names = ('type',) + fields + ('pseudo_type',)
+    variables = ['_%s' % field for field in field_names]
+    source = _NODE_METHODS.format(
+        items=', '.join("('%s', self.%s)" % (field, field) for field in field_names),
+        names=', '.join(variables),
+        values=', '.join('self.%s' % field for field in field_names),
+        copy=''.join('    copied.{0} = {1}[:] if copy_lists and _isinstance({1}, _list) else {1}\n'.format(field, variable)
+                     for field, variable in zip(field_names, variables)))
+    namespace = {'_fields': _fields, '_copy': _copy, '_new': object.__new__,
+                 '_setattr': setattr, '_isinstance': isinstance, '_list': list}
+    exec(source, namespace)
+    return type(name, (Node,), {
+        '__slots__': fields,
+        '_field_names': field_names,
+        'fields': namespace['fields'],
+        '_copy': namespace['copy']
+    })
+
+NODE_CLASSES.update({node_type: _node_class(node_type, fields) for node_type, fields in NODE_FIELDS.items()})
+TYPE_BITS.update({node_type: 1 << j for j, node_type in enumerate(NODE_FIELDS)})
+
+
+class _NodeDumper(yaml.Dumper):
+    pass
+
+_NodeDumper.add_multi_representer(Node, lambda dumper, node: dumper.represent_mapping('!Node', node.fields()))
 
 def node_representer(dumper, data):
     return dumper.represent_scalar('!%s' % type(data).__name__, )
@@ -79,8 +270,102 @@ def to_node(value):
     else:
         1/0
 
+def copy_node(node, copy_lists=True):
+    '''
+    a shallow copy of node which can be changed without touching node
+
+    list fields are copied too, because transformers often change them in place,
+    unless copy_lists is False
+    '''
+
+    return node._copy(copy_lists)
+
+def type_bit(node_type):
+    '''the bit of node_type in the subtree masks'''
+
+    bit = TYPE_BITS.get(node_type)
+    if bit is None:
+        with _type_bits_lock:
+            bit = TYPE_BITS.get(node_type)
+            if bit is None:
+                bit = TYPE_BITS[node_type] = 1 << len(TYPE_BITS)
+    return bit
+
+def types_mask(types):
+    '''the mask with the bits of types'''
+
+    mask = 0
+    for node_type in types:
+        mask |= type_bit(node_type)
+    return mask
+
+def subtree_mask(node, masks=None):
+    '''
+    a bitset(int) of the types of node and its descendants(see type_bit)
+
+    masks is a cache for one run(id(node) => (node, mask)), filled for all
+    the descendants: it keeps the nodes, so their ids aren't reused during the run
+    the masks aren't stored on the nodes, so a tree changed in place
+    between two runs gets new masks
+    '''
+
+    if masks is None:
+        masks = {}
+    entry = masks.get(id(node))
+    if entry is not None:
+        return entry[1]
+    return run_steps(_mask_step, node, masks) # deep trees don't hit the recursion limit
+
+def _mask_step(node, masks):
+    if isinstance(node, list):
+        mask = 0
+        for child in node:
+            if isinstance(child, (Node, list)):
+                mask |= yield child, masks
+        return mask
+    entry = masks.get(id(node))
+    if entry is not None:
+        return entry[1]
+    mask = type_bit(node.type)
+    for _, child in node.fields():
+        if isinstance(child, (Node, list)):
+            mask |= yield child, masks
+    masks[id(node)] = node, mask
+    return mask
+
+def count_nodes(tree):
+    '''the number of nodes in a tree'''
+
+    count, stack = 0, [tree]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, Node):
+            count += 1
+            stack.extend(child for _, child in value.fields())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return count
+
+def same_fields(node, other):
+    '''true if the fields of node and other are identical(or lists with identical elements)'''
+
+    fields, other_fields = node.fields(), other.fields()
+    if len(fields) != len(other_fields):
+        return False
+    for (field, value), (other_field, other_value) in zip(fields, other_fields):
+        if field != other_field:
+            return False
+        elif value is other_value:
+            continue
+        elif isinstance(value, list) and isinstance(other_value, list) and len(value) == len(other_value):
+            if any(a is not b for a, b in zip(value, other_value)):
+                return False
+        else:
+            return False
+    return True
+
 def assignment_updated(assignment, **kwargs):
-    ass = Node(assignment.type)
-    ass.__dict__.update(assignment.__dict__)
-    ass.__dict__.update(kwargs)
-    return ass
+    fields = dict(assignment.fields())
+    fields.update(kwargs)
+    del fields['type']
+    return Node(assignment.type, **fields)
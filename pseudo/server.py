@@ -0,0 +1,192 @@
+# a long running translation server, see pseudo serve
+import base64
+import json
+import os
+import socketserver
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import pseudo
+import pseudo.cache
+from pseudo.errors import PseudoError
+
+_cache = None # the translation cache of a worker
+
+
+def _init_worker(cache_dir=None):
+    global _cache
+    pseudo.warm_up()
+    _cache = pseudo.cache.TranslationCache(directory=cache_dir)
+
+
+def translate_request(request):
+    '''the response for a request(a dict), see Server'''
+
+    response = {'id': request.get('id')}
+    try:
+        languages = request.get('languages') or [request.get('language')]
+        for language in languages:
+            if language not in pseudo.SUPPORTED_FORMATS:
+                raise PseudoError('%s is not supported' % language)
+        if 'tree' in request:
+            intermediate_code = request['tree']
+        elif 'yaml' in request:
+            intermediate_code = request['yaml']
+        elif 'bin' in request:
+            intermediate_code = base64.b64decode(request['bin'])
+        else:
+            raise PseudoError('a request needs a tree, yaml or bin')
+        response['outputs'] = pseudo.generate_many(intermediate_code, languages, cache=_cache)
+    except Exception as e:
+        response['error'] = '%s: %s' % (type(e).__name__, e)
+    return response
+
+
+class Server:
+    '''
+    translates requests with warm workers
+
+    requests and responses are json objects, one per line:
+
+    request:  {"id": 1, "languages": ["py", "rb"], "tree": {"type": "module", ...}}
+              the input is one of tree(the ast as json), yaml(intermediate code)
+              or bin(the binary format in base64), "language": "py" works too
+    response: {"id": 1, "outputs": {"py": "...", "rb": "..."}}
+              or {"id": 1, "error": "PseudoStandardLibraryError: ..."}
+
+    the requests are translated concurrently by a pool of processes
+    (os.cpu_count() by default, workers=1 translates in this process),
+    each of them has parsed all the templates and has its own translation cache
+    responses are written when they're ready, so match them by id
+    '''
+
+    def __init__(self, workers=None, cache_dir=None):
+        if workers == 1:
+            _init_worker(cache_dir)
+            self.executor = None
+            self.lock = threading.Lock() # for the connection threads
+        else:
+            self.executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(cache_dir,))
+
+    def submit(self, line, respond):
+        '''
+        translate a request line, respond(response line) is called when it's ready
+
+        returns an event which is set after respond
+        '''
+
+        done = threading.Event()
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('a request should be a json object')
+        except ValueError as e:
+            _respond(respond, {'id': None, 'error': '%s: %s' % (type(e).__name__, e)}, done)
+            return done
+        if self.executor is None:
+            with self.lock:
+                response = translate_request(request)
+            _respond(respond, response, done)
+            return done
+
+        def callback(future):
+            _respond(respond, _result(future, request), done)
+
+        self.executor.submit(translate_request, request).add_done_callback(callback)
+        return done
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+
+def _result(future, request):
+    try:
+        return future.result()
+    except Exception as e: # a broken worker
+        return {'id': request.get('id'), 'error': '%s: %s' % (type(e).__name__, e)}
+
+
+def _respond(respond, response, done):
+    # done is set even if respond fails, so nobody waits for it forever
+    try:
+        respond(_line(response))
+    finally:
+        done.set()
+
+
+def _line(response):
+    return json.dumps(response) + '\n'
+
+
+def _writer(stream):
+    # thread safe writing of whole lines, the responses come from the pool threads
+    # after the first failed write(a closed connection or a broken pipe) the next lines are dropped
+    lock = threading.Lock()
+    broken = []
+
+    def write(line):
+        with lock:
+            if broken:
+                return
+            try:
+                stream.write(line)
+                stream.flush()
+            except (OSError, ValueError): # ValueError: a closed file
+                broken.append(True)
+    return write
+
+
+def serve_stdio(server, input=None, output=None):
+    '''serve the requests in input(stdin) until its end, the responses go to output(stdout)'''
+
+    input, output = input or sys.stdin, output or sys.stdout
+    write = _writer(output)
+    pending = [server.submit(line, write) for line in input if line.strip()]
+    for done in pending:
+        done.wait()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        write = _writer(_SocketLines(self.wfile))
+        pending = [self.server.pseudo_server.submit(line.decode('utf-8'), write) for line in self.rfile if line.strip()]
+        for done in pending:
+            done.wait()
+
+
+class _SocketLines:
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def write(self, line):
+        self.wfile.write(line.encode('utf-8'))
+
+    def flush(self):
+        self.wfile.flush()
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def socket_server(server, path):
+    '''a socketserver serving on a unix socket at path, each connection is a stream of requests'''
+
+    if os.path.exists(path):
+        os.unlink(path)
+    result = _UnixServer(path, _Handler)
+    result.pseudo_server = server
+    return result
+
+
+def serve_socket(server, path):
+    '''serve on a unix socket at path until interrupted'''
+
+    unix_server = socket_server(server, path)
+    try:
+        unix_server.serve_forever()
+    finally:
+        unix_server.server_close()
+        os.unlink(path)
@@ -1,72 +1,302 @@
-from pseudo.pseudo_tree import Node
+import contextlib
+import threading
+from pseudo.pseudo_tree import Node, copy_node, same_fields, subtree_mask, types_mask
+from pseudo.helpers import dispatch_table, run_steps
+
+# nodes which become current_class / current_function: handlers can change them later,
+# so they're always copied
+SCOPE_TYPES = {'module', 'class_definition', 'function_definition', 'anonymous_function', 'constructor', 'method_definition'}
+
+_walks = threading.local() # see iterative_walks and shared_masks
+
+# pruning stops for the run if it skipped less than a quarter of the subtrees
+# before PRUNE_SAMPLE subtrees with handled types: the masks cost more than they save
+PRUNE_SAMPLE = 256
+
+
+@contextlib.contextmanager
+def iterative_walks(iterative=True):
+    '''
+    the transformers created in the block(on this thread) are iterative
+
+    used for a whole run: the api translator, the per-run middleware instances
+    and the transformers they create
+    '''
+    old = getattr(_walks, 'iterative', False)
+    _walks.iterative = iterative
+    try:
+        yield
+    finally:
+        _walks.iterative = old
+
+
+@contextlib.contextmanager
+def shared_masks():
+    '''
+    the transformers created in the block(on this thread) share one subtree_mask cache
+
+    used for the passes of a run: copy on write keeps the unchanged subtrees
+    identical, so their masks are computed once for all the passes
+    (a nested block uses the cache of the outer one)
+    '''
+    old = getattr(_walks, 'masks', None)
+    _walks.masks = {} if old is None else old
+    try:
+        yield
+    finally:
+        _walks.masks = old
 
 
 class TreeTransformer:
     '''
     visits recursively nodes of the tree
-    with defined transform_<node_type> methods and transforms in place
+    with defined transform_<node_type> methods
+
+    copy on write: the original tree stays untouched and the result shares
+    all the unchanged subtrees with it
+    a node without a handler is walked without copying it and it's copied only
+    if one of its children changes, so unchanged subtrees aren't copied at all,
+    a node with a handler(or with an after hook) is copied before the handler changes it
+    and the copy is kept only if it's different
+    with copy_on_write = False it transforms in place
+
+    the transform_<node_type> handlers are looked up in a table built once per class,
+    handled_types are the node types with a handler
+    with prune = True subtrees without any of the handled types are skipped,
+    checked with the type bitsets of the subtrees(see subtree_mask), cached
+    by the instance: a transformer instance is used for one run
+    (only for transformers without before/after hooks which change only handled nodes)
+    the transformers created in a shared_masks block share the cache and
+    pruning stops for the run if the handled types are in most subtrees(see PRUNE_SAMPLE)
+
+    with iterative = True the default walk uses an explicit stack instead of recursive
+    calls(see iterative_transform), so deep trees don't hit the recursion limit,
+    handlers don't change: their own self.transform calls start a new walk
+    the transformers created in an iterative_walks block are iterative
     '''
 
     before = None
     after = None
     whitelist = None # if a set, transform only those nodes, optimization
+    prune = False
+    copy_on_write = True
+    iterative = False
+    subtree_masks = None # the cache of subtree_mask
+    _prune_hits = 0
+    _prune_misses = 0
 
     current_class = None
     current_function = None
 
+    # transform_<name> methods which aren't handlers: the walkers and helpers of subclasses
+    not_handlers = frozenset({'default', 'block'})
+
+    _handlers = {}
+    handled_types = frozenset()
+    handled_mask = 0
+    _default_walk = True
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._handlers = dispatch_table(cls, 'transform_', cls.not_handlers)
+        cls.handled_types = frozenset(cls._handlers)
+        cls.handled_mask = types_mask(cls.handled_types)
+        cls._default_walk = (cls.transform_default is TreeTransformer.transform_default and
+                             cls.transform_block is TreeTransformer.transform_block)
+
+    def __new__(cls, *args, **kwargs):
+        self = object.__new__(cls)
+        if getattr(_walks, 'iterative', False):
+            self.iterative = True
+        masks = getattr(_walks, 'masks', None)
+        if masks is not None:
+            self.subtree_masks = masks
+        return self
+
     def transform(self, tree, in_block=False, assignment=None):
+        if self.iterative:
+            return self.iterative_transform(tree, in_block, assignment)
+        return self._run(self._visit(tree, in_block, assignment))
+
+    def iterative_transform(self, tree, in_block=False, assignment=None):
+        '''
+        the same as transform, but the walk is a loop over a stack of _visit steps(see run_steps)
+        instead of recursive transform calls
+        '''
+        return run_steps(self._visit, tree, in_block, assignment)
+
+    def _run(self, steps):
+        # a step generator run recursively: each child it yields goes through self.transform
+        transform, send = self.transform, steps.send
+        try:
+            request = next(steps)
+            while True:
+                request = send(transform(*request))
+        except StopIteration as e:
+            return e.value
+
+    # the walk is written once, as step generators: each step yields (child, in_block, assignment)
+    # when it needs a transformed child and gets it back,
+    # transform runs them recursively and iterative_transform with an explicit stack
+
+    def _visit(self, tree, in_block=False, assignment=None):
+        if isinstance(tree, list):
+            result = []
+            for child in tree:
+                result.append((yield child, False, None))
+            return result
+        elif not isinstance(tree, Node):
+            return tree
+
         old_class, old_function = None, None
-        if isinstance(tree, Node):
-            if self.before:
-                tree = self.before(tree, in_block, assignment)
-            if self.whitelist and tree.type not in self.whitelist:
-                return tree
-            elif tree.type == 'class_definition' or tree.type == 'module':
-                old_class = self.current_class
-                self.current_class = tree
-            elif tree.type in {'function_definition', 'anonymous_function', 'constructor', 'method_definition', 'module'}:
-                old_function = self.current_function
-                self.current_function = tree
-            handler = getattr(self, 'transform_%s' % tree.type, None)
-            if handler:
-                tree = handler(tree, in_block, assignment)
-            else:
-                tree = self.transform_default(tree)
-            if self.after:
-                tree = self.after(tree, in_block, assignment)
-            self.current_function = old_function
-            self.current_class = old_class
+        if self.before:
+            tree = self.before(tree, in_block, assignment)
+        if self.whitelist and tree.type not in self.whitelist:
             return tree
-        elif isinstance(tree, list):
-            return [self.transform(child) for child in tree]
-        else:
+        if self.prune and self.pruned(tree, self.handled_mask):
             return tree
+        handler = self._handlers.get(tree.type)
+        if not handler and self.copy_on_write and self._default_walk and not self.after and tree.type not in SCOPE_TYPES:
+            return (yield from self._visit_shared(tree))
+        original = copied = tree
+        if self.copy_on_write:
+            tree = copied = copy_node(tree)
+        if tree.type == 'class_definition' or tree.type == 'module':
+            old_class = self.current_class
+            self.current_class = tree
+        elif tree.type in {'function_definition', 'anonymous_function', 'constructor', 'method_definition', 'module'}:
+            old_function = self.current_function
+            self.current_function = tree
+        if handler:
+            tree = handler(self, tree, in_block, assignment)
+        elif self._default_walk:
+            tree = yield from self._visit_fields(tree)
+        else:
+            tree = self.transform_default(tree)
+        if self.after:
+            tree = self.after(tree, in_block, assignment)
+        if copied is not original:
+            tree = self._collapse_copy(tree, copied, original)
+        self.current_function = old_function
+        self.current_class = old_class
+        return tree
 
-    def transform_default(self, tree):
-        for field, child in tree.__dict__.items():
+    def _visit_fields(self, tree):
+        # transform_default: the children of a copied node are changed in place
+        for field, child in tree.fields():
             if not field.endswith('type'):
-                print(field)
-                if isinstance(child, Node):
-                    print(getattr(child, 'value', None))
-                    print(getattr(child, 'name', None))
                 if isinstance(child, Node):
-                    setattr(tree, field, self.transform(child, False, tree if tree.type[-10:] == 'assignment' else None))
-                elif isinstance(child, list) and field == 'block' or field == 'main':
-                    setattr(tree, field, self.transform_block(child))
+                    setattr(tree, field, (yield child, False, tree if tree.type[-10:] == 'assignment' else None))
+                elif isinstance(child, list) and (field == 'block' or field == 'main'):
+                    setattr(tree, field, (yield from self._visit_block(child)))
                 elif isinstance(child, list):
-                    setattr(tree, field, self.transform(child))
+                    setattr(tree, field, (yield child, False, None))
         return tree
 
-    def transform_block(self, tree):
+    def _visit_block(self, items):
+        # transform_block: the statements of a block, a list result is spliced in it
         results = []
-        for child in tree:
-            result = self.transform(child, True)
+        for child in items:
+            result = yield child, True, None
             if not isinstance(result, list):
                 results.append(result)
             else:
                 results += result
         return results
 
+    def _visit_shared(self, tree):
+        # transform_default for a node which is copied only if a child changes
+        copied = None
+        for field, child in tree.fields():
+            if not field.endswith('type'):
+                if isinstance(child, Node):
+                    result = yield child, False, tree if tree.type[-10:] == 'assignment' else None
+                elif isinstance(child, list):
+                    result = yield from self._visit_list(child, field == 'block' or field == 'main')
+                else:
+                    continue
+                if result is not child:
+                    if copied is None:
+                        copied = copy_node(tree, copy_lists=False)
+                    setattr(copied, field, result)
+        return tree if copied is None else copied
+
+    def _visit_list(self, items, block):
+        # _visit_block or the walk of a list, the same list if no element changes
+        result = None
+        for j, child in enumerate(items):
+            if block:
+                new = yield child, True, None
+            elif isinstance(child, list):
+                new = yield from self._visit_list(child, False)
+            else:
+                new = yield child, False, None
+            if result is None:
+                if new is child:
+                    continue
+                result = items[:j]
+            if block and isinstance(new, list):
+                result += new
+            else:
+                result.append(new)
+        return items if result is None else result
+
+    def subtree_mask(self, tree):
+        if self.subtree_masks is None:
+            self.subtree_masks = {}
+        return subtree_mask(tree, self.subtree_masks)
+
+    def pruned(self, tree, mask):
+        '''true if tree can be skipped: none of its nodes has a type in mask'''
+        if not mask & self.subtree_mask(tree):
+            self._prune_hits += 1
+            return True
+        self._prune_misses += 1
+        if self._prune_misses == PRUNE_SAMPLE and self._prune_hits < PRUNE_SAMPLE // 4:
+            self.prune = False
+        return False
+
+    def set_trace(self, trace, stage=None):
+        '''
+        report each node visit with trace(event, stage, node, detail)
+
+        events are 'enter' and 'exit'(with the result as detail),
+        stage is the class name by default
+        untraced transformers don't pay anything for it
+        '''
+        self._trace = trace, stage or type(self).__name__
+        self._visit = self._traced_visit
+        return self
+
+    def _traced_visit(self, tree, in_block=False, assignment=None):
+        # _visit with the enter/exit events of set_trace
+        visit = type(self)._visit(self, tree, in_block, assignment)
+        if not isinstance(tree, Node):
+            return (yield from visit)
+        trace, stage = self._trace
+        trace('enter', stage, tree, None)
+        result = yield from visit
+        trace('exit', stage, tree, result)
+        return result
+
+    def _collapse_copy(self, result, copied, original):
+        # use the original node if its copy wasn't changed
+        if result is copied:
+            return original if same_fields(copied, original) else result
+        elif isinstance(result, list):
+            for j, node in enumerate(result):
+                if node is copied:
+                    if same_fields(copied, original):
+                        result[j] = original
+                    break
+        return result
+
+    def transform_default(self, tree):
+        return self._run(self._visit_fields(tree))
+
+    def transform_block(self, tree):
+        return self._run(self._visit_block(tree))
+
     # def transform_custom_exception(self, s, *w):
     #     # input(s)
     #     return s
\ No newline at end of file
@@ -0,0 +1,49 @@
+import unittest
+from pseudo.api_translator import ApiTranslator, compile_api
+from pseudo.errors import PseudoDSLError
+from pseudo.pseudo_tree import Node, local
+
+
+class TestApiDSL(unittest.TestCase):
+
+    def expand(self, api, receiver=None, args=()):
+        return compile_api(api)(None, receiver, list(args), 'Int', 'Egg')
+
+    def test_method(self):
+        node = self.expand('#push_back(%{1}, %{0})', local('a'), [local('b'), local('c')])
+        self.assertEqual(node.type, 'method_call')
+        self.assertEqual(node.message, 'push_back')
+        self.assertEqual([arg.name for arg in node.args], ['c', 'b'])
+
+    def test_static_call_and_attr(self):
+        node = self.expand('math.pow', None, [local('b')])
+        self.assertEqual((node.type, node.receiver.name, node.message), ('static_call', 'math', 'pow'))
+        node = self.expand('.length!', local('a'))
+        self.assertEqual((node.type, node.object.name, node.attr), ('attr', 'a', 'length'))
+
+    def test_function(self):
+        node = self.expand('len', local('a'))
+        self.assertEqual((node.type, node.args[0].name), ('call', 'a'))
+
+    def test_errors_on_class_creation(self):
+        for api in ['#a(%{0}', 'a#b#c', '#a(%{nope})', 2]:
+            with self.assertRaises(PseudoDSLError):
+                type('T', (ApiTranslator,), {'methods': {'List': {'@equivalent': 'list', 'x': api}}, 'functions': {}})
+        with self.assertRaises(PseudoDSLError):
+            type('T', (ApiTranslator,), {'methods': {}, 'functions': {'io': {'x': 'f(%{self})'}}})
+
+    def test_placeholders(self):
+        T = type('T', (ApiTranslator,), {
+            'methods': {'List': {'x': '#a(%{egg})'}},
+            'functions': {},
+            'egg_placeholder': lambda self, receiver, *args, equivalent: local(equivalent)})
+        node = T(None)._expand_api('#a(%{egg})', local('l'), [], 'Int', 'list')
+        self.assertEqual(node.args[0].name, 'list')
+
+    def test_entries_compiled_once(self):
+        T = type('T', (ApiTranslator,), {'methods': {}, 'functions': {}})
+        T(None)._expand_api('#a(%{0})', local('l'), [local('b')], 'Int', 'list')
+        expand = T._expanders['#a(%{0})']
+        node = T(None)._expand_api('#a(%{0})', local('l'), [local('c')], 'Int', 'list')
+        self.assertIs(T._expanders['#a(%{0})'], expand)
+        self.assertEqual(node.args[0].name, 'c')
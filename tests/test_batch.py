@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+import unittest
+import pseudo
+from pseudo.batch import run_batch, input_files, output_filename, jobs
+
+EXAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'examples', 'f.pseudo.yaml')
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.inputs = os.path.join(self.directory, 'in')
+        os.makedirs(os.path.join(self.inputs, 'sub'))
+        shutil.copy(EXAMPLE, os.path.join(self.inputs, 'f.pseudo.yaml'))
+        shutil.copy(EXAMPLE, os.path.join(self.inputs, 'sub', 'g.pseudo.yaml'))
+        with open(os.path.join(self.inputs, 'sub', 'broken.pseudo.yaml'), 'w') as f:
+            f.write('type: [')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_input_files(self):
+        self.assertEqual(
+            [os.path.relpath(f, self.inputs) for f in input_files([self.inputs])],
+            ['f.pseudo.yaml', os.path.join('sub', 'broken.pseudo.yaml'), os.path.join('sub', 'g.pseudo.yaml')])
+        self.assertEqual(len(input_files([os.path.join(self.inputs, '**', 'g.*.yaml')])), 1)
+
+    def test_outputs_next_to_inputs_are_not_inputs(self):
+        first = run_batch([self.inputs], ['py', 'rb'], 1)
+        second = run_batch([self.inputs], ['py', 'rb'], 1)
+        self.assertEqual(len(first.outputs), 4)
+        self.assertEqual(sorted(second.outputs), sorted(first.outputs))
+        self.assertEqual(len(second.errors), 1)
+        self.assertEqual(input_files([os.path.join(self.inputs, 'f.py')]), [os.path.join(self.inputs, 'f.py')])
+
+    def test_output_filename(self):
+        self.assertEqual(output_filename('a/b.pseudo.yaml', 'py'), 'a/b.py')
+        self.assertEqual(output_filename('a/b.pseudo.bin', 'go', 'out', 'a'), os.path.join('out', 'b.go'))
+
+    def test_run_batch(self):
+        out = os.path.join(self.directory, 'out')
+        for workers in (1, 2):
+            result = run_batch([self.inputs], ['py', 'rb'], workers, out)
+            self.assertEqual(len(result.outputs), 4)
+            self.assertEqual([(os.path.basename(f), language) for f, language, _ in result.errors], [('broken.pseudo.yaml', None)])
+            self.assertIn('[load]', result.report())
+            with open(os.path.join(out, 'sub', 'g.rb')) as f:
+                with open(EXAMPLE) as example:
+                    self.assertEqual(f.read(), pseudo.generate(pseudo.loader.as_tree(example.read()), 'rb'))
+
+    def test_a_job_for_each_language(self):
+        files = input_files([self.inputs])
+        todo, errors = jobs(files, ['py', 'python', 'rb'])
+        self.assertEqual([(os.path.basename(f), language) for f, language, _ in todo[:2]],
+                         [('f.pseudo.yaml', 'py'), ('f.pseudo.yaml', 'rb')])
+        self.assertEqual((len(todo), errors), (6, []))
+
+    def test_colliding_outputs(self):
+        with open(EXAMPLE) as f:
+            tree = pseudo.loader.as_tree(f.read())
+        with open(os.path.join(self.inputs, 'f.pseudo.bin'), 'wb') as f:
+            f.write(pseudo.loader.as_binary(tree))
+        result = run_batch([os.path.join(self.inputs, 'f.*')], ['py', 'python'], 1)
+        self.assertEqual(result.outputs, [os.path.join(self.inputs, 'f.py')])
+        self.assertEqual([(os.path.basename(f), language) for f, language, _ in result.errors], [('f.pseudo.yaml', 'py')])
+        self.assertIn('is the output of', result.errors[0][2])
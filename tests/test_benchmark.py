@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+import unittest
+import pseudo
+import pseudo.loader
+from pseudo.benchmark import synthetic_module, count_nodes, benchmark_source, compare, report, run
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_synthetic_module(self):
+        tree = synthetic_module(3)
+        self.assertEqual(len(tree.definitions), 3)
+        self.assertEqual(count_nodes(tree), count_nodes(synthetic_module(1)) * 3 - 2)
+        self.assertIn('def f2(a,b):', pseudo.generate(tree, 'py'))
+
+    def test_stages(self):
+        result = benchmark_source(pseudo.loader.as_yaml(synthetic_module(2)), ['go', 'py'], repeat=1)
+        self.assertEqual(result['nodes'], count_nodes(synthetic_module(2)))
+        self.assertEqual(list(result['languages']['go']), [
+            'api_translate', 'middleware:TupleMiddleware', 'middleware:GoConstructorMiddleware',
+            'middleware:DeclarationMiddleware', 'emit'])
+        self.assertGreater(result['languages']['py']['emit']['peak_bytes'], 0)
+        self.assertIn('go emit', report({'results': {'synthetic_2': result}}))
+
+    def test_compare(self):
+        def baseline(seconds):
+            values = {'seconds': seconds, 'nodes_per_second': 1, 'peak_bytes': 1}
+            return {'results': {'a': {'nodes': 1, 'parse': values, 'languages': {'py': {'emit': values, 'error': 'e'}}}}}
+
+        self.assertEqual(compare(baseline(1.0), baseline(1.1)), [])
+        self.assertEqual(compare(baseline(1.0), baseline(2.0)), [('a', None, 'parse', 1.0, 2.0), ('a', 'py', 'emit', 1.0, 2.0)])
+
+    def test_compare_errors(self):
+        values = {'seconds': 1.0, 'nodes_per_second': 1, 'peak_bytes': 1}
+        baseline = {'results': {'a': {'nodes': 1, 'parse': values, 'languages': {'py': {'emit': values}, 'go': {'error': 'e'}}}}}
+        current = {'results': {'a': {'nodes': 1, 'parse': values, 'languages': {'py': {'error': 'broken'}, 'go': {'error': 'e'}}}}}
+        self.assertEqual(compare(baseline, current), [('a', 'py', 'error', None, 'broken')])
+        self.assertEqual(compare(baseline, {'results': {}, 'skipped': {'a': 'fails'}}), [('a', None, 'error', None, 'fails')])
+
+    def test_skipped_inputs(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with open(os.path.join(directory, 'old.pseudo.yaml'), 'w') as f:
+            f.write('type: module\nmain: []\n') # no definitions, dependencies..
+        result = run(directory, [1], ['py', 'go'], repeat=1, startup_languages=[])
+        self.assertEqual(list(result['results']), ['synthetic_1'])
+        self.assertIn('old.pseudo.yaml', result['skipped'])
+        self.assertIn('old.pseudo.yaml: skipped, fails for every language', report(result))
+
+    def test_compare_startup(self):
+        def baseline(seconds):
+            return {'results': {}, 'startup': {'interpreter': 0.01, 'py': seconds, 'php': None}}
+
+        self.assertEqual(compare(baseline(0.1), baseline(0.11)), [])
+        self.assertEqual(compare(baseline(0.1), baseline(0.2)), [('startup', 'py', 'startup', 0.1, 0.2)])
+        self.assertEqual(compare({'results': {}}, baseline(0.2)), [])
+        self.assertIn('php', report(baseline(0.1)))
@@ -0,0 +1,42 @@
+import unittest
+from pseudo import binary_format
+from pseudo.errors import PseudoBinaryFormatError
+from pseudo.loader import as_tree, as_yaml, as_binary
+from pseudo.pseudo_tree import Node
+
+
+class TestBinaryFormat(unittest.TestCase):
+
+    def setUp(self):
+        self.tree = Node('module',
+            main=[Node('local', name='egg', pseudo_type='Int'), Node('local', name='egg', pseudo_type='Int')],
+            constants=[Node('float', value=2.5), Node('int', value=2 ** 70), Node('int', value=-2)],
+            options={'a': [True, False, None]},
+            name='ж')
+
+    def test_round_trip(self):
+        loaded = binary_format.loads(binary_format.dumps(self.tree))
+        self.assertEqual(loaded.y, self.tree.y)
+        self.assertIs(type(loaded.main[0]), type(self.tree.main[0]))
+
+    def test_interned_strings(self):
+        data = binary_format.dumps(self.tree)
+        self.assertEqual(data.count(b'egg'), 1)
+        self.assertEqual(data.count(b'local'), 1)
+
+    def test_invalid(self):
+        data = binary_format.dumps(self.tree)
+        for invalid in [b'', b'PSDX\x01N', b'PSDB\x63N', data[:-3], data + b'N']:
+            with self.assertRaises(PseudoBinaryFormatError):
+                binary_format.loads(invalid)
+
+    def test_invalid_strings(self):
+        data = binary_format.dumps(Node('local', name='abc'))
+        for invalid in [data[:-2], data.replace(b'abc', b'a\xffc'), binary_format.dumps(2 ** 70).replace(b'1', b'x')]:
+            with self.assertRaises(PseudoBinaryFormatError):
+                binary_format.loads(invalid)
+
+    def test_converters(self):
+        self.assertEqual(as_tree(as_binary(self.tree)).y, self.tree.y)
+        self.assertEqual(as_tree(as_yaml(self.tree)).y, self.tree.y)
+        self.assertEqual(as_binary(as_tree(as_yaml(self.tree))), as_binary(self.tree))
@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import pseudo
+from pseudo.cache import TranslationCache, tree_hash
+from pseudo.pseudo_tree import Node
+
+
+def module(*main):
+    return Node('module', definitions=[], dependencies=[], constants=[], custom_exceptions=[], main=list(main))
+
+
+class TestTranslationCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_tree_hash(self):
+        self.assertEqual(tree_hash(module(Node('local', name='a'))), tree_hash(module(Node('local', name='a'))))
+        self.assertNotEqual(tree_hash(module(Node('local', name='a'))), tree_hash(module(Node('local', name='b'))))
+
+    def test_hit_skips_translation(self):
+        cache = TranslationCache()
+        tree = module(Node('local', name='egg'))
+        code = pseudo.generate(tree, 'py', cache=cache)
+        with mock.patch('pseudo._generate', side_effect=AssertionError):
+            self.assertEqual(pseudo.generate(module(Node('local', name='egg')), 'py', cache=cache), code)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertNotEqual(cache.key(tree, 'py'), cache.key(tree, 'rb'))
+
+    def test_generate_many(self):
+        cache = TranslationCache()
+        tree = module(Node('local', name='egg'))
+        self.assertEqual(pseudo.generate_many(tree, ['py', 'go'], cache=cache), pseudo.generate_many(tree, ['py', 'go']))
+        pseudo.generate_many(tree, ['py', 'go'], cache=cache)
+        self.assertEqual(cache.hits, 2)
+
+    def test_lru(self):
+        cache = TranslationCache(max_entries=2)
+        for key in 'abc':
+            cache.set(key, key)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('c'), 'c')
+
+    def test_disk(self):
+        cache = TranslationCache(directory=self.directory)
+        cache.set('a', 'egg')
+        self.assertEqual(TranslationCache(directory=self.directory).get('a'), 'egg')
+
+    def test_disk_eviction(self):
+        cache = TranslationCache(directory=self.directory, max_bytes=10)
+        cache.set('a', 'x' * 6)
+        os.utime(os.path.join(self.directory, 'a'), (0, 0))
+        cache.set('b', 'y' * 6)
+        self.assertEqual(os.listdir(self.directory), ['b'])
+        self.assertEqual(cache.disk_size, 6)
+
+    def test_writes_dont_scan(self):
+        cache = TranslationCache(directory=self.directory, max_bytes=100, rescan_writes=4)
+        with mock.patch('os.listdir', wraps=os.listdir) as listdir:
+            for key in 'abc':
+                cache.set(key, 'x' * 6)
+            self.assertEqual(listdir.call_count, 0)
+            cache.set('a', 'x' * 8) # the 4th write rescans
+            self.assertEqual(listdir.call_count, 1)
+        self.assertEqual(cache.disk_size, 20)
+
+    def test_shared_directory(self):
+        # rescanned on each write, so each cache sees the other's files
+        first = TranslationCache(directory=self.directory, max_bytes=10, rescan_writes=1)
+        second = TranslationCache(directory=self.directory, max_bytes=10, rescan_writes=1)
+        first.set('a', 'x' * 6)
+        os.utime(os.path.join(self.directory, 'a'), (0, 0))
+        second.set('b', 'y' * 6)
+        self.assertEqual(os.listdir(self.directory), ['b'])
+        os.unlink(os.path.join(self.directory, 'b'))
+        first.set('c', 'z' * 6)
+        self.assertEqual(os.listdir(self.directory), ['c'])
+        first.clear()
+        second.clear()
+        self.assertEqual(os.listdir(self.directory), [])
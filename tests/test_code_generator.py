@@ -0,0 +1,117 @@
+import io
+import unittest
+import pseudo
+import pseudo.code_generator_writer
+from pseudo.code_generator import CodeGenerator
+from pseudo.generators.js_generator import JSGenerator
+from pseudo.generators.python_generator import PythonGenerator
+from pseudo.pseudo_tree import Node, local, to_node
+from suite import AnonymousFunction
+
+
+class TestTemplateCache(unittest.TestCase):
+
+    def test_shared_between_instances(self):
+        self.assertIs(PythonGenerator()._parsed_templates, PythonGenerator()._parsed_templates)
+
+    def test_reparsed_after_templates_change(self):
+        class A(CodeGenerator):
+            indent = 2
+            use_spaces = True
+            middlewares = []
+            templates = dict(local='%<name>')
+
+        first = A.parsed_templates()
+        self.assertIs(A.parsed_templates(), first)
+        A.templates = dict(local='_%<name>')
+        self.assertIsNot(A.parsed_templates(), first)
+        self.assertEqual(A().generate(Node('local', name='a')), '_a')
+
+    def test_reparsed_after_indent_change(self):
+        class B(CodeGenerator):
+            indent = 2
+            use_spaces = True
+            templates = dict(local='%<name>')
+
+        first = B.parsed_templates()
+        B.indent = 4
+        self.assertIsNot(B.parsed_templates(), first)
+
+
+class TestTrace(unittest.TestCase):
+
+    def test_trace_events(self):
+        from pseudo import generate
+        events = []
+        tree = Node('module', definitions=[], dependencies=[], constants=[], custom_exceptions=[],
+                    main=[Node('local', name='egg')])
+        source = generate(tree, 'go', trace=lambda event, stage, node, detail: events.append((event, stage, node.type)))
+        self.assertIn(('enter', 'api_translate', 'local'), events)
+        self.assertIn(('middleware', 'DeclarationMiddleware', 'module'), events)
+        self.assertIn(('template', 'generate', 'local'), events)
+        self.assertEqual(events[-1], ('exit', 'generate', 'module'))
+        self.assertEqual(source, generate(tree, 'go'))
+
+
+class RecordingStream(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.writes = []
+
+    def write(self, text):
+        self.writes.append(text)
+        return super().write(text)
+
+
+class TestGenerateTo(unittest.TestCase):
+
+    def module(self, main):
+        return Node('module', dependencies=[], constants=[], custom_exceptions=[], definitions=[], main=main)
+
+    def test_writes_statements_separately(self):
+        tree = self.module([local('a'), local('b'), local('c')])
+        stream = RecordingStream()
+        JSGenerator().generate_to(tree, stream)
+        self.assertEqual(stream.getvalue(), 'a;\nb;\nc;')
+        self.assertEqual(stream.getvalue(), JSGenerator().generate(tree))
+        self.assertGreater(len(stream.writes), 2)
+
+    def test_additional_code(self):
+        tree = self.module([local('a'), AnonymousFunction[1], local('b')])
+        translated = pseudo.API_TRANSLATORS['py'](tree).api_translate()
+        stream = io.StringIO()
+        PythonGenerator().generate_to(translated, stream)
+        self.assertEqual(stream.getvalue(), 'def a_0(source):\n    print(source)\n    return ves(len(source))\n\n\n\na\na_0\nb\n\n')
+
+    def test_empty_blocks(self):
+        tree = self.module([])
+        tree.definitions = [
+            Node('function_definition', name='f', params=[], block=[], pseudo_type=['Function', 'Void'], return_type='Void'),
+            Node('class_definition', name='A', base=None, constructor=None, attrs=[], methods=[])]
+        self.assertEqual(PythonGenerator().generate(tree), 'def f():\n    pass\n\nclass A:\n    pass\n\n')
+
+    def test_same_as_joined(self):
+        tree = self.module([local('a'), Node('if_statement', test=local('b'), block=[], otherwise=None)])
+        tree.definitions = [Node('function_definition', name='f', params=[], block=[], pseudo_type=['Function', 'Void'], return_type='Void')]
+        for generator in [PythonGenerator, JSGenerator]:
+            streamed = generator().generate(tree)
+            joined = generator()
+            joined.stream_templates = False
+            self.assertEqual(streamed, joined.generate(tree))
+
+    def test_names_starting_with_pass(self):
+        tree = self.module([local('passes')])
+        tree.definitions = [Node('function_definition', name='f', params=[], block=[to_node(1)],
+                                 pseudo_type=['Function', 'Int'], return_type='Int')]
+        self.assertEqual(PythonGenerator().generate(tree), 'def f():\n    1\n\npasses\n')
+
+    def test_big_modules_are_spooled_to_a_file(self):
+        tree = self.module([local('a'), AnonymousFunction[1], local('b')])
+        translated = pseudo.API_TRANSLATORS['py'](tree).api_translate()
+        expected = PythonGenerator().generate(translated)
+        size = pseudo.code_generator_writer.SPOOL_SIZE
+        pseudo.code_generator_writer.SPOOL_SIZE = 2
+        try:
+            self.assertEqual(PythonGenerator().generate(translated), expected)
+        finally:
+            pseudo.code_generator_writer.SPOOL_SIZE = size
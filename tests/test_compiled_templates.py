@@ -0,0 +1,50 @@
+import unittest
+from pseudo.code_generator import CodeGenerator
+from pseudo.tree_transformer import TreeTransformer
+import test_python, test_ruby, test_javascript, test_csharp, test_cpp, test_go
+
+
+class CompiledTemplates:
+    '''runs a language suite with compiled templates'''
+
+    @classmethod
+    def setUpClass(cls):
+        CodeGenerator.compiled = True
+
+    @classmethod
+    def tearDownClass(cls):
+        CodeGenerator.compiled = False
+
+
+class IterativeWalk:
+    '''runs a language suite with the iterative transformers and generators'''
+
+    @classmethod
+    def setUpClass(cls):
+        CodeGenerator.iterative = TreeTransformer.iterative = True
+
+    @classmethod
+    def tearDownClass(cls):
+        CodeGenerator.iterative = TreeTransformer.iterative = False
+
+
+def compiled(suite, mode=CompiledTemplates, prefix='Compiled'):
+    # suite.TestLanguage sets default gen helpers if they're not in the namespace
+    return type(suite)('Test%s%s' % (prefix, suite.__name__[4:]), (mode, suite), {
+        'gen': suite.gen,
+        'gen_with_imports': suite.gen_with_imports
+    })
+
+TestCompiledPython = compiled(test_python.TestPython)
+TestCompiledRuby = compiled(test_ruby.TestRuby)
+TestCompiledJavascript = compiled(test_javascript.TestJavascript)
+TestCompiledCSharp = compiled(test_csharp.TestCSharp)
+TestCompiledCpp = compiled(test_cpp.TestCpp)
+TestCompiledGo = compiled(test_go.TestGo)
+
+TestIterativePython = compiled(test_python.TestPython, IterativeWalk, 'Iterative')
+TestIterativeRuby = compiled(test_ruby.TestRuby, IterativeWalk, 'Iterative')
+TestIterativeJavascript = compiled(test_javascript.TestJavascript, IterativeWalk, 'Iterative')
+TestIterativeCSharp = compiled(test_csharp.TestCSharp, IterativeWalk, 'Iterative')
+TestIterativeCpp = compiled(test_cpp.TestCpp, IterativeWalk, 'Iterative')
+TestIterativeGo = compiled(test_go.TestGo, IterativeWalk, 'Iterative')
@@ -0,0 +1,50 @@
+import unittest
+import pseudo
+import suite
+from pseudo.code_generator import CodeGenerator
+from pseudo.middlewares import (FusedMiddleware, DeclarationMiddleware, TupleMiddleware,
+                                GoConstructorMiddleware, CppPointerMiddleware, CppDisplayExceptionMiddleware)
+from pseudo.pseudo_tree import Node
+
+from test_pseudo import module
+
+
+def generate(tree, language, fuse):
+    CodeGenerator.fuse_middlewares = fuse
+    try:
+        return pseudo.generate(tree, language)
+    finally:
+        CodeGenerator.fuse_middlewares = True
+
+
+class TestFusedMiddleware(unittest.TestCase):
+
+    def test_passes(self):
+        passes = FusedMiddleware.passes([DeclarationMiddleware, CppPointerMiddleware, CppDisplayExceptionMiddleware])
+        self.assertEqual(passes[0], DeclarationMiddleware)
+        self.assertEqual(passes[1].middlewares, [CppPointerMiddleware, CppDisplayExceptionMiddleware])
+        self.assertEqual(passes[1].__name__, 'CppPointerMiddleware+CppDisplayExceptionMiddleware')
+        self.assertEqual(FusedMiddleware.passes([TupleMiddleware, DeclarationMiddleware]), [TupleMiddleware, DeclarationMiddleware])
+
+    def test_same_as_separate_passes(self):
+        examples = [getattr(suite, name) for name in dir(suite) if name[0].isupper()]
+        examples = [e for e in examples if isinstance(e, list) and e and all(isinstance(n, Node) for n in e)]
+        self.assertGreater(len(examples), 30)
+        for language in ['cpp', 'go']:
+            generated = 0
+            for example in examples:
+                if example[0].type in {'function_definition', 'class_definition'}:
+                    tree = module([], example)
+                else:
+                    tree = module(example)
+                try:
+                    expected = generate(tree, language, False)
+                except Exception as e:
+                    # unsupported by the separate passes too: the fused walk fails the same way
+                    with self.assertRaises(type(e)) as raised:
+                        generate(tree, language, True)
+                    self.assertEqual(str(raised.exception), str(e))
+                    continue
+                self.assertEqual(generate(tree, language, True), expected)
+                generated += 1
+            self.assertGreater(generated, 30)
@@ -0,0 +1,66 @@
+import time
+import unittest
+import pseudo
+import suite
+from pseudo.benchmark import synthetic_module
+from pseudo.incremental import IncrementalGenerator
+from pseudo.pseudo_tree import Node, local, to_node
+
+from test_pseudo import module
+
+
+def function(name, value):
+    return Node('function_definition',
+        name=name,
+        params=[],
+        pseudo_type=['Function', 'Int'],
+        return_type='Int',
+        block=[Node('implicit_return', value=to_node(value))])
+
+
+class TestIncrementalGenerator(unittest.TestCase):
+
+    def test_only_changed_definitions(self):
+        for language in ['python', 'ruby', 'javascript', 'csharp', 'cpp', 'go']:
+            generator = IncrementalGenerator(language)
+            tree = module(suite.Assignment, [function('a', 2), function('b', 4)] + suite.FunctionDefinition)
+            self.assertEqual(generator.generate(tree), pseudo.generate(tree, language))
+            self.assertEqual((generator.reused, generator.expanded), (0, 3))
+
+            tree = module(suite.Assignment, [function('a', 2), function('b', 8)] + suite.FunctionDefinition)
+            self.assertEqual(generator.generate(tree), pseudo.generate(tree, language))
+            self.assertEqual((generator.reused, generator.expanded), (2, 1))
+
+    def test_additional_code(self):
+        lambda_function = Node('function_definition',
+            name='c',
+            params=[],
+            pseudo_type=['Function', 'Void'],
+            return_type='Void',
+            block=[Node('assignment', target=local('l', 'Function'), value=suite.AnonymousFunction[1])])
+        generator = IncrementalGenerator('python')
+        tree = module([], [lambda_function, function('a', 2)])
+        generator.generate(tree)
+        tree = module([], [lambda_function, function('a', 4)])
+        self.assertEqual(generator.generate(tree), pseudo.generate(tree, 'python'))
+        self.assertEqual(generator.reused, 1)
+
+    def test_faster_than_generate(self):
+        # a module with 100 functions and one changed function: the other 99
+        # aren't translated, processed or generated again
+        generator = IncrementalGenerator('python')
+        generator.generate(synthetic_module(100))
+        incremental = full = None
+        for value in range(3):
+            tree = synthetic_module(100)
+            tree.definitions[50].block[-1] = Node('implicit_return', value=to_node(value), pseudo_type='Int')
+            start = time.perf_counter()
+            code = generator.generate(tree)
+            seconds = time.perf_counter() - start
+            incremental = seconds if incremental is None else min(incremental, seconds)
+            start = time.perf_counter()
+            self.assertEqual(code, pseudo.generate(tree, 'python'))
+            seconds = time.perf_counter() - start
+            full = seconds if full is None else min(full, seconds)
+            self.assertEqual((generator.reused, generator.expanded), (99, 1))
+        self.assertLess(incremental, full)
@@ -0,0 +1,110 @@
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+import yaml
+from pseudo import loader
+from pseudo.errors import PseudoError
+from pseudo.loader import as_tree, convert_to_syntax_tree, TreeLoader
+from pseudo.pseudo_tree import Node
+
+SOURCE = '''
+type: module
+main:
+  - type: assignment
+    target: {type: local, name: a, pseudo_type: Int}
+    value: {type: int, value: 2, pseudo_type: Int}
+    first_mention: true
+    pseudo_type: Void
+constants: []
+options: {x: [1, 2]}
+'''
+
+
+class TestLoader(unittest.TestCase):
+
+    def test_as_tree(self):
+        tree = as_tree(SOURCE)
+        self.assertIsInstance(tree, Node)
+        self.assertEqual(tree.main[0].target.name, 'a')
+        self.assertEqual(tree.main[0].value.value, 2)
+        self.assertEqual(tree.options, {'x': [1, 2]})
+        self.assertEqual(tree.y, convert_to_syntax_tree(yaml.safe_load(SOURCE)).y)
+
+    def test_pure_python_fallback(self):
+        class PureTreeLoader(yaml.SafeLoader):
+            construct_tree_mapping = TreeLoader.construct_tree_mapping
+
+        PureTreeLoader.add_constructor('tag:yaml.org,2002:map', PureTreeLoader.construct_tree_mapping)
+        self.assertEqual(yaml.load(SOURCE, Loader=PureTreeLoader).y, as_tree(SOURCE).y)
+
+
+class TestFrontEnds(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'egg.zz')
+        with open(self.filename, 'w') as f:
+            f.write('egg')
+
+    def tearDown(self):
+        os.unlink(self.filename)
+        os.rmdir(self.directory)
+        loader.FRONT_ENDS.pop('zz', None)
+        loader.COMMANDS.pop('zz', None)
+        loader._front_ends.pop('zz', None)
+
+    def test_in_process(self):
+        loader.register_front_end('zz', lambda source: {'type': 'local', 'name': source})
+        called = []
+        tree = as_tree(loader.load_input(self.filename, called.append))
+        self.assertEqual(tree.name, 'egg')
+        self.assertEqual(called, [])
+
+    def test_not_importable(self):
+        loader.register_front_end('zz', 'pseudo_zz_which_doesnt_exist')
+        self.assertIsNone(loader.front_end('zz'))
+
+    def test_command(self):
+        loader.COMMANDS['zz'] = lambda filename: ['pseudo-zz', filename]
+
+        def call_command(args):
+            self.assertNotEqual(os.path.dirname(args[1]), self.directory)
+            with open(args[1]) as f, open(args[1][:-3] + '.pseudo.yaml', 'w') as g:
+                g.write('type: local\nname: %s\n' % f.read())
+
+        tree = as_tree(loader.load_input(self.filename, call_command))
+        self.assertEqual(tree.name, 'egg')
+        self.assertEqual(os.listdir(self.directory), ['egg.zz'])
+
+    def test_command_leaving_files(self):
+        loader.COMMANDS['zz'] = lambda filename: ['pseudo-zz', filename]
+        directories = []
+
+        def call_command(args):
+            directories.append(os.path.dirname(args[1]))
+            with open(os.path.join(directories[0], 'egg.log'), 'w') as f:
+                f.write('log')
+            with open(args[1][:-3] + '.pseudo.yaml', 'w') as f:
+                f.write('type: local\nname: egg\n')
+
+        self.assertEqual(as_tree(loader.load_input(self.filename, call_command)).name, 'egg')
+        self.assertFalse(os.path.exists(directories[0]))
+
+    def test_async_in_process(self):
+        loader.register_front_end('zz', lambda source: {'type': 'local', 'name': source})
+        tree = as_tree(asyncio.run(loader.aload_input(self.filename)))
+        self.assertEqual(tree.name, 'egg')
+
+    def test_async_command(self):
+        script = 'import sys; open(sys.argv[1][:-3] + ".pseudo.yaml", "w").write("type: local\\nname: " + open(sys.argv[1]).read())'
+        loader.COMMANDS['zz'] = lambda filename: [sys.executable, '-c', script, filename]
+        tree = as_tree(asyncio.run(loader.aload_input(self.filename)))
+        self.assertEqual(tree.name, 'egg')
+        self.assertEqual(os.listdir(self.directory), ['egg.zz'])
+
+    def test_async_failing_command(self):
+        loader.COMMANDS['zz'] = lambda filename: [sys.executable, '-c', 'raise SystemExit(2)']
+        with self.assertRaises(PseudoError):
+            asyncio.run(loader.aload_input(self.filename))
@@ -0,0 +1,56 @@
+import unittest
+import pseudo
+from pseudo.middlewares import NameMiddleware
+from pseudo.middlewares.name_middleware import convert_name, NAME_CACHE_SIZE
+from pseudo.pseudo_tree import Node, local, assignment, to_node
+
+from test_pseudo import module
+
+
+class CountingNameMiddleware(NameMiddleware):
+    conversions = 0
+
+    def convert_to_camel_case(self, name):
+        CountingNameMiddleware.conversions += 1
+        return NameMiddleware.convert_to_camel_case(self, name)
+
+
+class TestNameMiddleware(unittest.TestCase):
+
+    def tree(self):
+        return module([
+            assignment(local('first_name', 'Int'), to_node(2)),
+            assignment(local('last_name', 'Int'), local('first_name', 'Int')),
+            Node('binary_op', op='+', left=local('first_name', 'Int'), right=local('value', 'Int'), pseudo_type='Int')])
+
+    def test_conversions(self):
+        self.assertEqual(convert_name('camel_case', 'first_name'), 'firstName')
+        self.assertEqual(convert_name('pascal_case', 'first_name'), 'FirstName')
+        self.assertEqual(convert_name('snake_case', 'firstName'), 'first_name')
+        self.assertEqual(convert_name.cache_info().maxsize, NAME_CACHE_SIZE)
+
+    def test_each_name_is_converted_once(self):
+        CountingNameMiddleware.conversions = 0
+        tree = CountingNameMiddleware(normal_name='camel_case').process(self.tree())
+        self.assertEqual([n.target.name for n in tree.main[:2]], ['firstName', 'lastName'])
+        self.assertEqual(tree.main[2].left.name, 'firstName')
+        self.assertEqual(CountingNameMiddleware.conversions, 3)
+
+    def test_names(self):
+        names = {}
+        NameMiddleware(normal_name='camel_case').process(self.tree(), names)
+        self.assertEqual(names, {'firstName': 'first_name', 'lastName': 'last_name'})
+
+    def test_generate_names(self):
+        tree = self.tree()
+        names = {}
+        self.assertEqual(pseudo.generate(tree, 'cs', names=names), pseudo.generate(tree, 'cs'))
+        self.assertEqual(names, {'firstName': 'first_name', 'lastName': 'last_name'})
+        names = {}
+        pseudo.generate_many(tree, ['cs', 'py'], names=names)
+        self.assertEqual(names['py'], {})
+
+    def test_shared_cache(self):
+        self.assertTrue(NameMiddleware.shared_cache)
+        self.assertFalse(CountingNameMiddleware.shared_cache)
+        self.assertTrue(type('Renamer', (NameMiddleware,), {'renames': False}).shared_cache)
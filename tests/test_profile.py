@@ -0,0 +1,33 @@
+import unittest
+import pseudo
+import pseudo.loader
+from pseudo.profile import Profile
+from pseudo.pseudo_tree import Node, local, count_nodes
+
+
+class TestProfile(unittest.TestCase):
+
+    def setUp(self):
+        self.tree = Node('module', dependencies=[], constants=[], custom_exceptions=[], definitions=[],
+                         main=[local('egg'), local('ham')])
+
+    def test_stages(self):
+        profile = Profile()
+        source = pseudo.generate(self.tree, 'go', profile=profile)
+        self.assertEqual(source, pseudo.generate(self.tree, 'go'))
+        self.assertEqual([(s.language, s.name) for s in profile.stages], [
+            ('go', 'api_translate'),
+            ('go', 'middleware:TupleMiddleware+GoConstructorMiddleware'), # fused
+            ('go', 'middleware:DeclarationMiddleware'),
+            ('go', 'emit')])
+        self.assertEqual(profile.stages[0].nodes, count_nodes(self.tree))
+        self.assertIsNone(profile.stages[0].allocated)
+        self.assertIn('middleware:DeclarationMiddleware', profile.report())
+
+    def test_parse_and_memory(self):
+        profile = Profile(memory=True)
+        pseudo.generate_many(pseudo.loader.as_yaml(self.tree), ['py', 'rb'], profile=profile)
+        self.assertEqual([(s.language, s.name) for s in profile.stages], [
+            (None, 'parse'), ('py', 'api_translate'), ('py', 'emit'), ('rb', 'api_translate'), ('rb', 'emit')])
+        self.assertEqual(profile.stages[0].nodes, 3)
+        self.assertGreater(profile.stages[0].peak, 0)
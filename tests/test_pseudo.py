@@ -0,0 +1,195 @@
+import asyncio
+import os
+import re
+import subprocess
+import sys
+import threading
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import pseudo
+import suite
+from pseudo.cache import TranslationCache
+from pseudo.pseudo_tree import Node, to_node
+from test_tree_transformer import sum_chain, elseif_chain
+
+LANGUAGES = ['python', 'ruby', 'javascript', 'csharp', 'cpp', 'go']
+
+
+def module(main, definitions=()):
+    return Node('module',
+        definitions=list(definitions),
+        dependencies=[],
+        constants=[],
+        custom_exceptions=[],
+        main=main)
+
+def snapshot(tree):
+    if isinstance(tree, Node):
+        return {k: snapshot(v) for k, v in tree.fields()}
+    elif isinstance(tree, list):
+        return [snapshot(e) for e in tree]
+    else:
+        return tree
+
+EXAMPLES = [
+    (LANGUAGES, module(suite.Assignment + suite.IfStatement + suite.ForStatement + suite.StandardCall[:1])),
+    (LANGUAGES, module(suite.WhileStatement + suite.Dictionary + suite.AnonymousFunction, suite.FunctionDefinition)),
+    (LANGUAGES, module(suite.BinaryOp + suite.MethodCall + suite.StandardMethodCall)),
+    (['python', 'ruby', 'go'], module(suite.Tuple + suite.List, suite.ClassConstructor))
+]
+
+
+class TestGenerateMany(unittest.TestCase):
+
+    def test_same_as_generate(self):
+        for languages, example in EXAMPLES:
+            expected = {language: pseudo.generate(example, language) for language in languages}
+            self.assertEqual(pseudo.generate_many(example, languages), expected)
+
+    def test_tree_is_not_changed(self):
+        for languages, example in EXAMPLES:
+            before = snapshot(example)
+            pseudo.generate_many(example, languages)
+            self.assertEqual(snapshot(example), before)
+
+
+class TestGenerate(unittest.TestCase):
+
+    def test_tree_is_not_changed(self):
+        for languages, example in EXAMPLES:
+            before = snapshot(example)
+            for language in languages:
+                pseudo.generate(example, language)
+                self.assertEqual(snapshot(example), before)
+
+    def test_cached_tree_gives_same_output(self):
+        for languages, example in EXAMPLES:
+            for language in languages:
+                self.assertEqual(pseudo.generate(example, language), pseudo.generate(example, language))
+
+    def test_unchanged_subtrees_are_shared(self):
+        definition = suite.FunctionDefinition[0]
+        translated = pseudo.API_TRANSLATORS['python'](module([], [definition])).api_translate()
+        self.assertIs(translated.definitions[0].params[0], definition.params[0])
+
+    def test_tree_changed_in_place(self):
+        call = Node('call', function=Node('local', name='f', pseudo_type=['Function', 'Int', 'Void']),
+                    args=[to_node(2)], pseudo_type='Void')
+        tree = module([call])
+        pseudo.generate(tree, 'go')
+        call.args.append(suite.Tuple[0])
+        self.assertIn('42.2', pseudo.generate(tree, 'go'))
+
+
+class TestDeepTrees(unittest.TestCase):
+    '''trees deeper than the recursion limit with iterative(php isn't in LANGUAGES, its generator is a stub)'''
+
+    def setUp(self):
+        self.depth = sys.getrecursionlimit() * 2
+        self.sum_chain = module([sum_chain(self.depth)])
+        self.elseif_chain = module([elseif_chain(self.depth)])
+
+    def check(self, outputs):
+        for language in LANGUAGES:
+            self.assertEqual(outputs[language, 'sum'].count('+ 2'), self.depth)
+            self.assertEqual(len(re.findall(r'if \(?a\b', outputs[language, 'elseif'])), self.depth)
+
+    def test_generate(self):
+        self.check({(language, name): pseudo.generate(tree, language, iterative=True)
+                    for language in LANGUAGES
+                    for name, tree in [('sum', self.sum_chain), ('elseif', self.elseif_chain)]})
+
+    def test_same_as_recursive(self):
+        for tree in (module([sum_chain(40)]), module([elseif_chain(40)])):
+            self.assertEqual(pseudo.generate_many(tree, LANGUAGES, iterative=True), pseudo.generate_many(tree, LANGUAGES))
+
+    def test_cache(self):
+        cache = TranslationCache()
+        for _ in range(2): # translated, then from the cache
+            for code in pseudo.generate_many(self.sum_chain, LANGUAGES, cache=cache, iterative=True).values():
+                self.assertEqual(code.count('+ 2'), self.depth)
+
+    def test_intermediate_code(self):
+        binary = pseudo.loader.as_binary(self.sum_chain)
+        self.assertEqual(pseudo.loader.as_binary(pseudo.loader.as_tree(binary)), binary)
+        tree = pseudo.loader.as_tree(pseudo.loader.as_yaml(self.sum_chain))
+        self.assertEqual(pseudo.loader.as_binary(tree), binary)
+
+    def test_command_line(self):
+        command = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bin', 'pseudo')
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'deep.pseudo.bin')
+            with open(filename, 'wb') as f:
+                f.write(pseudo.loader.as_binary(self.sum_chain))
+            subprocess.check_call([sys.executable, command, filename, 'py', '--iterative'])
+            with open(os.path.join(directory, 'deep.py')) as f:
+                self.assertEqual(f.read().count('+ 2'), self.depth)
+
+
+class TestRegistries(unittest.TestCase):
+
+    def test_like_dicts(self):
+        self.assertEqual(set(pseudo.GENERATORS), set(pseudo.SUPPORTED_FORMATS))
+        self.assertIn('py', pseudo.API_TRANSLATORS)
+        self.assertNotIn('swift', pseudo.API_TRANSLATORS)
+        self.assertEqual(pseudo.GENERATORS['python'].__name__, 'PythonGenerator')
+        self.assertIs(pseudo.GENERATORS.get('go'), pseudo.GENERATORS['golang'])
+        with self.assertRaises(KeyError):
+            pseudo.GENERATORS['swift']
+
+    def test_registering(self):
+        registry = pseudo.LazyRegistry('generators', 'Generator')
+        registry['py2'] = str
+        self.assertIs(registry['py2'], str)
+        del registry['py']
+        self.assertNotIn('py', registry)
+        self.assertEqual(len(registry), len(pseudo.SUPPORTED_FORMATS))
+
+    def test_imports_only_used_languages(self):
+        script = ('import sys, pseudo\n'
+                  'pseudo.generate(pseudo.Node("module", dependencies=[], constants=[], custom_exceptions=[], definitions=[], main=[]), "py")\n'
+                  'print(" ".join(m for m in sys.modules if m.startswith(("pseudo.generators.", "pseudo.api_translators."))))')
+        modules = subprocess.check_output([sys.executable, '-c', script], universal_newlines=True).split()
+        self.assertIn('pseudo.generators.python_generator', modules)
+        self.assertEqual([m for m in modules if 'python' not in m], [])
+
+
+class TestAsync(unittest.TestCase):
+
+    def setUp(self):
+        self.max_translations = pseudo._max_translations
+
+    def tearDown(self):
+        pseudo.configure_async(None, self.max_translations)
+
+    def test_same_as_generate(self):
+        languages, tree = EXAMPLES[0]
+
+        async def main():
+            return await asyncio.gather(pseudo.agenerate(tree, 'py'), pseudo.agenerate_many(tree, languages))
+
+        output, outputs = asyncio.run(main())
+        self.assertEqual(output, pseudo.generate(tree, 'py'))
+        self.assertEqual(outputs, pseudo.generate_many(tree, languages))
+
+    def test_bounded_concurrency(self):
+        executor = ThreadPoolExecutor(8)
+        self.addCleanup(executor.shutdown)
+        pseudo.configure_async(executor, 2)
+        lock, running, most = threading.Lock(), [0], [0]
+
+        def translate():
+            with lock:
+                running[0] += 1
+                most[0] = max(most[0], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+
+        async def main():
+            await asyncio.gather(*[pseudo._in_executor(translate) for _ in range(6)])
+
+        asyncio.run(main())
+        self.assertEqual(most[0], 2)
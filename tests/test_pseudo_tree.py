@@ -0,0 +1,60 @@
+import copy
+import pickle
+import unittest
+from pseudo.pseudo_tree import (Node, NODE_FIELDS, copy_node, assignment_updated, local, to_node,
+                                 subtree_mask, type_bit, types_mask)
+
+
+class TestNode(unittest.TestCase):
+
+    def test_compact_class(self):
+        node = Node('local', name='egg', pseudo_type='Int')
+        self.assertIsInstance(node, Node)
+        self.assertIn('name', type(node).__slots__)
+        self.assertEqual(node.fields(), [('type', 'local'), ('name', 'egg'), ('pseudo_type', 'Int')])
+
+    def test_unknown_fields(self):
+        node = Node('local', name='egg', hint='x')
+        self.assertEqual(node.hint, 'x')
+        self.assertEqual(node.fields(), [('type', 'local'), ('name', 'egg'), ('pseudo_type', 'Void'), ('hint', 'x')])
+        self.assertEqual(Node('_custom', z=2).fields(), [('type', '_custom'), ('pseudo_type', 'Void'), ('z', 2)])
+
+    def test_missing_fields(self):
+        self.assertIn('otherwise', NODE_FIELDS['if_statement'])
+        self.assertFalse(hasattr(Node('if_statement', test=None, block=[]), 'otherwise'))
+
+    def test_copies(self):
+        node = Node('assignment', target=Node('local', name='a'), value=Node('int', value=2), first_mention=True, hint=0)
+        for copied in [copy.deepcopy(node), pickle.loads(pickle.dumps(node)), copy_node(node)]:
+            self.assertIs(type(copied), type(node))
+            self.assertEqual(copied.target.name, 'a')
+            self.assertEqual([f for f, _ in copied.fields()], [f for f, _ in node.fields()])
+        self.assertEqual(assignment_updated(node, first_mention=False).first_mention, False)
+
+    def test_copy_lists(self):
+        block, extra = [local('a')], [local('b')]
+        node = Node('if_statement', test=None, block=block, hint=extra)
+        copied = copy_node(node)
+        self.assertEqual(copied.fields(), node.fields())
+        self.assertIsNot(copied.block, block)
+        self.assertIsNot(copied.hint, extra)
+        self.assertFalse(hasattr(copied, 'otherwise'))
+        self.assertIs(copy_node(node, copy_lists=False).block, block)
+
+
+class TestSubtreeMask(unittest.TestCase):
+
+    def test_mask(self):
+        tree = Node('list', elements=[to_node(2), Node('list', elements=[local('a')])])
+        self.assertEqual(subtree_mask(tree), types_mask(['list', 'int', 'local']))
+        self.assertEqual(subtree_mask(Node('_new_type')), type_bit('_new_type'))
+
+    def test_cached_per_run(self):
+        tree = Node('list', elements=[to_node(2)])
+        masks = {}
+        mask = subtree_mask(tree, masks)
+        self.assertEqual(masks[id(tree)], (tree, mask))
+        self.assertIn(id(tree.elements[0]), masks)
+        tree.elements.append(local('a'))
+        self.assertEqual(subtree_mask(tree, masks), mask)
+        self.assertTrue(subtree_mask(tree) & type_bit('local'))
@@ -0,0 +1,79 @@
+import base64
+import io
+import json
+import os
+import socket
+import tempfile
+import threading
+import unittest
+import pseudo.loader
+from pseudo.server import Server, translate_request, serve_stdio, socket_server, _writer
+
+TREE = {'type': 'module', 'dependencies': [], 'constants': [], 'custom_exceptions': [], 'definitions': [],
+        'main': [{'type': 'local', 'name': 'egg'}]}
+
+
+class TestServer(unittest.TestCase):
+
+    def test_inputs(self):
+        tree = pseudo.loader.as_tree(TREE)
+        for request in [
+                {'id': 1, 'language': 'py', 'tree': TREE},
+                {'id': 1, 'language': 'py', 'yaml': pseudo.loader.as_yaml(tree)},
+                {'id': 1, 'language': 'py', 'bin': base64.b64encode(pseudo.loader.as_binary(tree)).decode('ascii')}]:
+            self.assertEqual(translate_request(request), {'id': 1, 'outputs': {'py': 'egg\n'}})
+
+    def test_errors(self):
+        self.assertEqual(translate_request({'id': 2, 'language': 'zz', 'tree': TREE}),
+                         {'id': 2, 'error': 'PseudoError: zz is not supported'})
+        self.assertEqual(translate_request({'id': 3, 'language': 'py'}),
+                         {'id': 3, 'error': 'PseudoError: a request needs a tree, yaml or bin'})
+
+    def test_stdio(self):
+        requests = io.StringIO('%s\n\nnot json\n%s\n' % (
+            json.dumps({'id': 1, 'languages': ['rb', 'js'], 'tree': TREE}),
+            json.dumps({'id': 2, 'language': 'py', 'tree': TREE})))
+        output = io.StringIO()
+        serve_stdio(Server(workers=1), requests, output)
+        responses = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(responses[0], {'id': 1, 'outputs': {'rb': 'egg\n\n', 'js': 'egg;'}})
+        self.assertIsNone(responses[1]['id'])
+        self.assertEqual(responses[2], {'id': 2, 'outputs': {'py': 'egg\n'}})
+
+    def test_failing_respond(self):
+        def respond(line):
+            raise BrokenPipeError()
+
+        server = Server(workers=2)
+        try:
+            line = json.dumps({'id': 1, 'language': 'py', 'tree': TREE})
+            self.assertTrue(server.submit(line, respond).wait(10))
+        finally:
+            server.close()
+
+    def test_closed_output(self):
+        output = io.StringIO()
+        write = _writer(output)
+        output.close()
+        write('a\n')
+        serve_stdio(Server(workers=1), ['{"id": 1, "language": "py", "yaml": "x"}\n'], output)
+
+    @unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'no unix sockets')
+    def test_socket(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'pseudo.sock')
+            server = socket_server(Server(workers=1), path)
+            thread = threading.Thread(target=server.serve_forever)
+            thread.start()
+            try:
+                client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                client.connect(path)
+                client.sendall((json.dumps({'id': 'a', 'language': 'py', 'tree': TREE}) + '\n').encode('utf-8'))
+                client.shutdown(socket.SHUT_WR)
+                response = client.makefile().readline()
+                client.close()
+            finally:
+                server.shutdown()
+                server.server_close()
+                thread.join()
+            self.assertEqual(json.loads(response), {'id': 'a', 'outputs': {'py': 'egg\n'}})
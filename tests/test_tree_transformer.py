@@ -0,0 +1,163 @@
+import sys
+import unittest
+from pseudo.code_generator import CodeGenerator
+from pseudo.generators.js_generator import JSGenerator
+from pseudo.generators.ruby_generator import RubyGenerator
+from pseudo.loader import convert_to_syntax_tree
+from pseudo.middlewares import NameMiddleware, TupleMiddleware
+from pseudo.pseudo_tree import Node, local, to_node
+import pseudo.tree_transformer
+from pseudo.tree_transformer import TreeTransformer, PRUNE_SAMPLE, shared_masks
+
+
+class Renamer(TreeTransformer):
+    prune = True
+
+    def __init__(self):
+        self.visited = []
+
+    def transform(self, tree, in_block=False, assignment=None):
+        if isinstance(tree, Node):
+            self.visited.append(tree.type)
+        return TreeTransformer.transform(self, tree, in_block, assignment)
+
+    def transform_local(self, node, in_block=False, assignment=None):
+        node.name = node.name.upper()
+        return node
+
+
+class IterativeRenamer(Renamer):
+    iterative = True
+
+
+def sum_chain(depth):
+    tree = local('a')
+    for _ in range(depth):
+        tree = Node('binary_op', op='+', left=tree, right=to_node(2), pseudo_type='Int')
+    return tree
+
+
+def elseif_chain(depth):
+    tree = None
+    for j in range(depth):
+        tree = Node('elseif_statement', test=local('a'), block=[to_node(j)], otherwise=tree)
+    return Node('if_statement', test=local('b'), block=[], otherwise=tree)
+
+
+class TestTreeTransformer(unittest.TestCase):
+
+    def test_dispatch_table(self):
+        self.assertEqual(Renamer.handled_types, frozenset({'local'}))
+        self.assertIn('tuple', TupleMiddleware.handled_types)
+        self.assertEqual(NameMiddleware.handled_types, frozenset({'local', 'instance_variable', 'function_definition', 'method_definition', 'method_call'}))
+        self.assertNotIn('to', JSGenerator._generate_handlers)
+
+    def test_base_transformer(self):
+        tree = Node('binary_op', op='+', left=local('a'), right=to_node(2))
+        self.assertIs(TreeTransformer().transform(tree), tree)
+
+    def test_main_without_statements(self):
+        tree = Node('module', definitions=[local('a')], main=None)
+        for transformer in [Renamer(), IterativeRenamer()]:
+            result = transformer.transform(tree)
+            self.assertIsNone(result.main)
+            self.assertEqual(result.definitions[0].name, 'A')
+
+    def test_prune(self):
+        literals = Node('list', elements=[to_node(2), to_node(4)])
+        tree = Node('module', main=[literals, Node('binary_op', op='+', left=local('a'), right=to_node(2))])
+        renamer = Renamer()
+        result = renamer.transform(tree)
+        self.assertEqual(result.main[1].left.name, 'A')
+        self.assertEqual(tree.main[1].left.name, 'a')
+        self.assertIs(result.main[0], literals)
+        self.assertEqual(renamer.visited, ['module', 'list', 'binary_op', 'local', 'int']) # not the list elements
+
+    def test_shared_masks(self):
+        tree = Node('list', elements=[to_node(2), local('a')])
+        with shared_masks():
+            first, second = Renamer(), Renamer()
+        self.assertIs(first.subtree_masks, second.subtree_masks)
+        first.transform(tree)
+        self.assertIn(id(tree.elements[0]), second.subtree_masks)
+        self.assertIsNone(Renamer().subtree_masks)
+
+    def test_prune_stops(self):
+        names = Node('list', elements=[local('a') for _ in range(PRUNE_SAMPLE)])
+        renamer = Renamer()
+        self.assertEqual({n.name for n in renamer.transform(names).elements}, {'A'})
+        self.assertFalse(renamer.prune)
+        literals = Node('list', elements=[to_node(j) for j in range(PRUNE_SAMPLE)] + [local('a')])
+        renamer = Renamer()
+        renamer.transform(literals)
+        self.assertTrue(renamer.prune)
+
+    def test_copies_only_changed_paths(self):
+        copies = []
+        copy_node = pseudo.tree_transformer.copy_node
+
+        def counting_copy(node, copy_lists=True):
+            copies.append(node.type)
+            return copy_node(node, copy_lists)
+
+        literals = Node('list', elements=[to_node(2), Node('list', elements=[to_node(4)])])
+        tree = Node('if_statement', test=local('a'), block=[literals], otherwise=None)
+        pseudo.tree_transformer.copy_node = counting_copy
+        try:
+            for transformer in [Renamer, IterativeRenamer]:
+                copies[:] = []
+                walker = transformer()
+                walker.prune = False
+                result = walker.transform(tree)
+                self.assertEqual(copies, ['local', 'if_statement'])
+                self.assertIs(result.block, tree.block)
+                self.assertEqual((result.test.name, tree.test.name), ('A', 'a'))
+                self.assertIs(walker.transform(literals), literals)
+        finally:
+            pseudo.tree_transformer.copy_node = copy_node
+
+    def test_generate_handlers(self):
+        class A(CodeGenerator):
+            indent = 2
+            use_spaces = True
+            middlewares = []
+            templates = dict(local='%<name>')
+
+            def generate_int(self, node, depth):
+                return 'i%d' % node.value
+
+        self.assertEqual(A().generate(to_node(2)), 'i2')
+        self.assertEqual(A().generate(local('a')), 'a')
+
+    def test_iterative(self):
+        tree = sum_chain(2)
+        result = IterativeRenamer().transform(tree)
+        self.assertEqual(result.y, Renamer().transform(tree).y)
+        self.assertEqual(tree.left.left.name, 'a')
+
+    def test_iterative_deep_tree(self):
+        depth = sys.getrecursionlimit() * 2
+        result = IterativeRenamer().transform(sum_chain(depth))
+        for _ in range(depth):
+            result = result.left
+        self.assertEqual(result.name, 'A')
+
+    def test_iterative_generator(self):
+        for generator in (JSGenerator, RubyGenerator):
+            for tree in (sum_chain(40), elseif_chain(40)):
+                self.assertEqual(generator(iterative=True)._generate_node(tree), generator()._generate_node(tree))
+
+    def test_iterative_generator_deep_tree(self):
+        depth = sys.getrecursionlimit() * 2
+        code = JSGenerator(iterative=True)._generate_node(sum_chain(depth))
+        self.assertEqual(code, 'a' + ' + 2' * depth)
+        code = RubyGenerator(iterative=True)._generate_node(elseif_chain(depth))
+        self.assertEqual(code.count('elsif a'), depth)
+
+    def test_convert_deep_tree(self):
+        depth = sys.getrecursionlimit() * 2
+        tree = {'type': 'local', 'name': 'a'}
+        for _ in range(depth):
+            tree = {'type': 'binary_op', 'op': '+', 'left': tree, 'right': {'type': 'int', 'value': 2}}
+        result = convert_to_syntax_tree(tree)
+        self.assertEqual(result.right.value, 2)